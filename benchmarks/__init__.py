@@ -0,0 +1,6 @@
+""" Benchmarks of the SFG analysis on synthetic graphs.
+
+Run `python -m benchmarks.run` from the root folder of the repo to time the analysis for all graph families
+    and sizes; see `python -m benchmarks.run --help` for the options, e.g. to save the results as JSON and
+    to compare them with the results of a previous release.
+"""
@@ -0,0 +1,117 @@
+""" Generators for parametric families of signal flow graphs. """
+
+from dataclasses import dataclass
+import random
+from lib import SFG
+
+
+WEIGHT_TYPES = ['float', 'complex', 'sympy']
+
+
+@dataclass
+class Case:
+    """ A benchmark graph, and the (source, sink) pairs whose gains are calculated. """
+    family: str
+    size: int
+    weights: str
+    sfg: SFG
+    pairs: list[tuple[str,str]]
+
+
+class _Weights:
+    """ Creates edge weights of one of the WEIGHT_TYPES; numeric weights are small, so that the graphs are stable. """
+
+    def __init__(self, weights: str, seed: int):
+        assert weights in WEIGHT_TYPES, f'Expecting weights to be one of {WEIGHT_TYPES}'
+        self.weights = weights
+        self.random = random.Random(seed)
+        if weights == 'sympy':
+            import sympy
+            self._symbol = sympy.Symbol
+
+
+    def __call__(self, name: str):
+        if self.weights == 'float':
+            return self.random.uniform(-0.5, 0.5)
+        elif self.weights == 'complex':
+            return complex(self.random.uniform(-0.4, 0.4), self.random.uniform(-0.4, 0.4))
+        return self._symbol(name)
+
+
+def two_port_chain(stages: int, weights: str = 'float', seed: int = 0) -> Case:
+    """ Cascade of two-port networks, as in `samples/05_sparam_matrix.py`; the gains are S11 and S21 of the cascade. """
+    w = _Weights(weights, seed)
+    sfg = SFG(group_name_sep='.')
+    sfg.add('P1.a', 'S0.1a')
+    sfg.add('S0.1b', 'P1.b')
+    for k in range(stages):
+        sfg.add(f'S{k}.1a', f'S{k}.1b', w(f'S11_{k}'))
+        sfg.add(f'S{k}.2a', f'S{k}.1b', w(f'S12_{k}'))
+        sfg.add(f'S{k}.1a', f'S{k}.2b', w(f'S21_{k}'))
+        sfg.add(f'S{k}.2a', f'S{k}.2b', w(f'S22_{k}'))
+        if k+1 < stages:
+            sfg.add(f'S{k}.2b', f'S{k+1}.1a')
+            sfg.add(f'S{k+1}.1b', f'S{k}.2a')
+    sfg.add('P2.a', f'S{stages-1}.2a')
+    sfg.add(f'S{stages-1}.2b', 'P2.b')
+    return Case('chain', stages, weights, sfg, [('P1.a', 'P1.b'), ('P1.a', 'P2.b')])
+
+
+def nested_control_loops(depth: int, weights: str = 'float', seed: int = 0) -> Case:
+    """
+    Control loops nested in each other, as in `samples/02_control_loop.py`; each level also has a local
+        feedback loop in its controller, and the local loops of different levels do not touch each other.
+    """
+    w = _Weights(weights, seed)
+    sfg = SFG(group_name_sep='.')
+    sfg.add('Ref', 'L0.Σ')
+    for k in range(depth):
+        sfg.add(f'L{k}.Σ', f'L{k}.Ctrl', w(f'C_{k}'))
+        sfg.add(f'L{k}.Ctrl', f'L{k}.D', w(f'D_{k}'))
+        sfg.add(f'L{k}.D', f'L{k}.Ctrl', w(f'F_{k}'))
+        sfg.add(f'L{k}.Ctrl', f'L{k+1}.Σ' if k+1 < depth else 'Plant')
+        sfg.add(f'L{k+1}.Y' if k+1 < depth else 'Plant', f'L{k}.Y', w(f'P_{k}'))
+        sfg.add(f'L{k}.Y', f'L{k}.Σ', w(f'H_{k}'))
+    sfg.add('L0.Y', 'Out')
+    return Case('nested', depth, weights, sfg, [('Ref', 'Out')])
+
+
+def random_sparse(nodes: int, weights: str = 'float', seed: int = 0, edges_per_node: int = 2) -> Case:
+    """
+    Random directed graph, where each node has an edge to the next node, so that the output is reachable,
+        and further edges to random other nodes.
+    """
+    w = _Weights(weights, seed)
+    r = random.Random(seed)
+    sfg = SFG()
+    sfg.add('In', 'N0')
+    for i in range(nodes):
+        if i+1 < nodes:
+            sfg.add(f'N{i}', f'N{i+1}', w(f'W_{i}_{i+1}'))
+        for j in r.sample([j for j in range(nodes) if j not in (i,i+1)], min(edges_per_node-1, nodes-2)):
+            sfg.add(f'N{i}', f'N{j}', w(f'W_{i}_{j}'))
+    sfg.add(f'N{nodes-1}', 'Out')
+    return Case('random', nodes, weights, sfg, [('In', 'Out')])
+
+
+def meshed_nport(ports: int, weights: str = 'float', seed: int = 0) -> Case:
+    """ N-port network where every port couples to every port, and all ports except the first one have reflective terminations. """
+    w = _Weights(weights, seed)
+    sfg = SFG(group_name_sep='.')
+    for i in range(ports):
+        for j in range(ports):
+            sfg.add(f'Net.a{j}', f'Net.b{i}', w(f'S{i}{j}'))
+    sfg.add('Src.b', 'Net.a0')
+    sfg.add('Net.b0', 'Src.a')
+    for i in range(1, ports):
+        sfg.add(f'Net.b{i}', f'Net.a{i}', w(f'Γ{i}'))
+    return Case('mesh', ports, weights, sfg, [('Src.b', 'Src.a'), ('Src.b', f'Net.b{ports-1}')])
+
+
+FAMILIES = {
+    'chain':  (two_port_chain,       [1, 2, 4, 6, 8, 10]),
+    'nested': (nested_control_loops, [1, 2, 4, 8, 12]),
+    'random': (random_sparse,        [8, 12, 16, 20, 24, 28]),
+    'mesh':   (meshed_nport,         [2, 3, 4, 5, 6]),
+}
+""" For each family name, the generator function and the default sizes. """
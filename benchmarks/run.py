@@ -0,0 +1,164 @@
+""" Times the SFG analysis for all graph families, sizes and weight types, and reports how it scales.
+
+Usage: `python -m benchmarks.run [--families chain mesh] [--weights float sympy] [--json results.json] [--compare old.json]`
+"""
+
+import argparse
+import datetime
+import json
+import platform
+import sys
+import time
+from typing import Callable
+from lib import SFG
+from .graphs import FAMILIES, WEIGHT_TYPES, Case
+
+
+OPERATIONS = ['find_loops', 'find_paths', 'calculate_gain', 'plot']
+
+
+def _operation(case: Case, operation: str) -> Callable:
+    """ Get a function that runs one operation on the case. """
+    if operation == 'find_loops':
+        return lambda: case.sfg.find_loops()
+    if operation == 'find_paths':
+        return lambda: [case.sfg.find_paths(source, sink) for (source,sink) in case.pairs]
+    if operation == 'calculate_gain':
+        return lambda: [case.sfg.calculate_gain(source, sink) for (source,sink) in case.pairs]
+    if operation == 'plot':
+        return lambda: case.sfg.plot().source
+    raise ValueError(f'Unknown operation "{operation}"')
+
+
+def measure(make_case: Callable[[], Case], operation: str, repeat: int) -> float:
+    """
+    Measure the best time of an operation, in seconds.
+
+    Args:
+        make_case: function that creates the case; it is called for every repetition, and SFG.default_cache
+            is cleared, so that no results are cached between the repetitions. This is not measured.
+        operation: one of OPERATIONS.
+        repeat:    number of repetitions.
+    """
+    best = None
+    for _ in range(repeat):
+        function = _operation(make_case(), operation)
+        SFG.default_cache.clear()
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(families: list[str], weight_types: list[str], operations: list[str], repeat: int = 3, max_seconds: float = 5.0, log=None) -> list[dict]:
+    """
+    Run the benchmarks.
+
+    Args:
+        families:     names of the graph families; see graphs.FAMILIES.
+        weight_types: weight types; see graphs.WEIGHT_TYPES.
+        operations:   operations to measure; see OPERATIONS.
+        repeat:       number of repetitions of each measurement.
+        max_seconds:  once an operation takes longer than this, larger sizes of the same family are skipped.
+        log:          if given, a function that is called with a line of text after each case.
+
+    Returns:
+        A list of results, one dict per case.
+    """
+    results = []
+    for family in families:
+        generator, sizes = FAMILIES[family]
+        for weights in weight_types:
+            skipped = set()
+            for size in sizes:
+                make_case = lambda: generator(size, weights)
+                case = make_case()
+                result = dict(
+                    family=family, size=size, weights=weights,
+                    nodes=len(set(case.sfg.graph) | {destination for destinations in case.sfg.graph.values() for (destination,_) in destinations}),
+                    edges=sum(len(destinations) for destinations in case.sfg.graph.values()),
+                    loops=len(case.sfg.find_loops()),
+                    paths=sum(len(case.sfg.find_paths(source, sink)) for (source,sink) in case.pairs),
+                    seconds={},
+                )
+                for operation in operations:
+                    if operation in skipped:
+                        continue
+                    seconds = measure(make_case, operation, repeat)
+                    result['seconds'][operation] = seconds
+                    if seconds > max_seconds:
+                        skipped.add(operation)
+                results.append(result)
+                if log is not None:
+                    log(format_table([result], header=False))
+    return results
+
+
+def format_table(results: list[dict], header: bool = True, baseline: "list[dict]|None" = None) -> str:
+    """
+    Format results as a text table.
+
+    Args:
+        results:  the results, as returned by run().
+        header:   if True, the table starts with a header line.
+        baseline: if given, the ratio of the time to the time of the same case in these results is appended.
+    """
+    reference = {}
+    for result in (baseline or []):
+        reference[(result['family'], result['size'], result['weights'])] = result['seconds']
+    lines = []
+    if header:
+        lines.append(f'{"family":<8} {"size":>5} {"weights":<8} {"nodes":>6} {"edges":>6} {"loops":>7} {"paths":>7} ' + ' '.join(f'{op:>16}' for op in OPERATIONS))
+    for result in results:
+        cells = []
+        for operation in OPERATIONS:
+            seconds = result['seconds'].get(operation)
+            if seconds is None:
+                cells.append(f'{"-":>16}')
+                continue
+            cell = f'{seconds*1e3:.3g} ms'
+            old = reference.get((result['family'], result['size'], result['weights']), {}).get(operation)
+            if old:
+                cell += f' ({seconds/old:.2f}x)'
+            cells.append(f'{cell:>16}')
+        lines.append(f'{result["family"]:<8} {result["size"]:>5} {result["weights"]:<8} {result["nodes"]:>6} {result["edges"]:>6} {result["loops"]:>7} {result["paths"]:>7} ' + ' '.join(cells))
+    return '\n'.join(lines)
+
+
+def main(argv: "list[str]|None" = None):
+    parser = argparse.ArgumentParser(description='Benchmark the SFG analysis on synthetic graphs.')
+    parser.add_argument('--families', nargs='+', choices=list(FAMILIES), default=list(FAMILIES))
+    parser.add_argument('--weights', nargs='+', choices=WEIGHT_TYPES, default=WEIGHT_TYPES)
+    parser.add_argument('--operations', nargs='+', choices=OPERATIONS, default=OPERATIONS)
+    parser.add_argument('--repeat', type=int, default=3, help='number of repetitions per measurement (default: %(default)s)')
+    parser.add_argument('--max-seconds', type=float, default=5.0, help='skip larger sizes once an operation takes longer (default: %(default)s)')
+    parser.add_argument('--json', metavar='PATH', help='save the results to this JSON file')
+    parser.add_argument('--compare', metavar='PATH', help='compare against the results in this JSON file')
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = json.load(fp)['results']
+
+    print(format_table([], header=True))
+    results = run(args.families, args.weights, args.operations, args.repeat, args.max_seconds, log=print)
+    if baseline is not None:
+        print()
+        print(f'Compared to {args.compare}:')
+        print(format_table(results, baseline=baseline))
+
+    if args.json:
+        report = dict(
+            created=datetime.datetime.now().isoformat(timespec='seconds'),
+            python=sys.version,
+            platform=platform.platform(),
+            results=results,
+        )
+        with open(args.json, 'w') as fp:
+            json.dump(report, fp, indent=1)
+
+
+if __name__ == '__main__':
+    main()
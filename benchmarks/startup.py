@@ -0,0 +1,119 @@
+""" Times the cold start of the package, i.e. `python -c "from lib import SFG"`, as paid by every short-lived worker.
+
+Usage: `python -m benchmarks.startup [--repeat 20] [--json startup.json] [--compare old.json]`
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+
+STATEMENTS = {
+    'python': 'pass',
+    'import': 'from lib import SFG',
+    'analysis': "from lib import SFG; s = SFG(); s.add('a', 'b', 2); s.add('b', 'a', 0.25); s.calculate_gain('a', 'b')",
+}
+""" Statements that are timed, each in a new interpreter; 'python' is the startup of the interpreter itself. """
+
+THIRD_PARTY = ['graphviz', 'numpy', 'scipy', 'sympy']
+""" Packages that the core analysis must not import. """
+
+
+def measure(statement: str, repeat: int) -> float:
+    """
+    Measure the best wall time of running a statement in a new interpreter, in seconds.
+
+    Args:
+        statement: the statement, which is run with `python -c` from the root folder of the repo.
+        repeat:    number of repetitions.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    # warm up the bytecode cache and the OS file cache, which a long-running deployment has as well
+    subprocess.run([sys.executable, '-c', statement], cwd=root, check=True)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', statement], cwd=root, check=True)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def imported_packages(statement: str) -> list[str]:
+    """ Get the packages of THIRD_PARTY that are imported by a statement. """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    check = f'{statement}; import sys; print(" ".join(p for p in {THIRD_PARTY!r} if p in sys.modules))'
+    output = subprocess.run([sys.executable, '-c', check], cwd=root, check=True, capture_output=True, text=True).stdout
+    return output.split()
+
+
+def run(repeat: int = 20) -> dict:
+    """
+    Run the benchmark.
+
+    Args:
+        repeat: number of repetitions of each measurement.
+
+    Returns:
+        A dict with the best time per statement (see STATEMENTS) in seconds, and the third-party packages that
+            each statement imports.
+    """
+    return dict(
+        seconds={name: measure(statement, repeat) for name,statement in STATEMENTS.items()},
+        packages={name: imported_packages(statement) for name,statement in STATEMENTS.items() if name != 'python'},
+    )
+
+
+def format_table(result: dict, baseline: "dict|None" = None) -> str:
+    """
+    Format a result as a text table; the time of the package is the time beyond the interpreter startup.
+
+    Args:
+        result:   the result, as returned by run().
+        baseline: if given, the ratio of the time to the time in this result is appended.
+    """
+    python = result['seconds']['python']
+    lines = [f'{"statement":<10} {"total":>10} {"package":>18}  third-party imports']
+    for name,seconds in result['seconds'].items():
+        cell = f'{(seconds - python)*1e3:.1f} ms' if name != 'python' else '-'
+        old = (baseline or {}).get('seconds', {})
+        if name != 'python' and name in old:
+            cell += f' ({(seconds - python)/max(1e-9, old[name] - old["python"]):.2f}x)'
+        packages = ' '.join(result['packages'].get(name, [])) or ('-' if name == 'python' else 'none')
+        lines.append(f'{name:<10} {seconds*1e3:>7.1f} ms {cell:>18}  {packages}')
+    return '\n'.join(lines)
+
+
+def main(argv: "list[str]|None" = None):
+    parser = argparse.ArgumentParser(description='Benchmark the import time of the package.')
+    parser.add_argument('--repeat', type=int, default=20, help='number of repetitions per measurement (default: %(default)s)')
+    parser.add_argument('--json', metavar='PATH', help='save the result to this JSON file')
+    parser.add_argument('--compare', metavar='PATH', help='compare against the result in this JSON file')
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = json.load(fp)['result']
+
+    result = run(args.repeat)
+    print(format_table(result, baseline))
+
+    if args.json:
+        report = dict(
+            created=datetime.datetime.now().isoformat(timespec='seconds'),
+            python=sys.version,
+            platform=platform.platform(),
+            result=result,
+        )
+        with open(args.json, 'w') as fp:
+            json.dump(report, fp, indent=1)
+
+
+if __name__ == '__main__':
+    main()
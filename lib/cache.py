@@ -0,0 +1,81 @@
+""" Bounded cache of analysis results, shared by all SFGs, so that analyzing an identical graph again is free. """
+
+from collections import OrderedDict
+from typing import Callable, Hashable
+import threading
+
+
+class AnalysisCache:
+    """
+    A least-recently-used cache of analysis results, keyed by hashable fingerprints of the graph.
+
+    The results are shared, not copied; a cached Mason decomposition keeps memoizing its cofactors, so every
+        SFG with the same graph benefits from them. E.g. re-running a notebook cell, which builds the same SFG
+        again, reuses the loops, loop gains, path gains and cofactors of the previous run.
+
+    The cache can be used from multiple threads (e.g. by SFGService); the results are created outside of its
+        lock, so two threads that miss the same key at the same time both create the result.
+    """
+
+    def __init__(self, maxsize: int = 64):
+        """
+        Args:
+            maxsize: maximum number of entries; the least recently used entries are evicted first.
+                0 disables the cache.
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+    def get(self, key: "Hashable|None", create: Callable):
+        """
+        Get a cached result, or create and store it.
+
+        Args:
+            key:    the key of the result; if None, the result is created, but not cached.
+            create: function without arguments that creates the result.
+        """
+        if key is None or self.maxsize <= 0:
+            return create()
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return value
+        value = create()
+        with self._lock:
+            self._entries[key] = value
+            self._evict()
+        return value
+
+
+    def resize(self, maxsize: int):
+        """ Change the maximum number of entries, and evict entries if there are more. """
+        with self._lock:
+            self.maxsize = maxsize
+            self._evict()
+
+
+    def clear(self):
+        """ Remove all entries, and reset the statistics. """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+    def _evict(self):
+        """ Internal method to evict the least recently used entries; the lock must be held. """
+        while len(self._entries) > max(0, self.maxsize):
+            self._entries.popitem(last=False)
@@ -0,0 +1,261 @@
+""" Compact, integer-indexed storage of a SFG. """
+
+from array import array
+from typing import Iterator
+import itertools
+from .monitor import AnalysisMonitor
+from .search import cycles_from, reaching, simple_cycles, simple_paths, strongly_connected_components
+from .mason import product
+
+
+def is_zero(weight) -> bool:
+    """ Check if a weight is zero; weights that cannot be compared to zero (e.g. numpy arrays) are not zero. """
+    try:
+        return bool(weight == 0)
+    except (TypeError, ValueError):
+        return False
+
+
+class CompactGraph:
+    """
+    A SFG with its nodes interned to integer IDs, and its edges stored in CSR (compressed sparse row) layout.
+
+    The out-edges of node `i` have the edge IDs `offsets[i]` to `offsets[i+1]-1`; `targets` holds the
+        destination node ID of each edge, and `weights` the weight of each edge; `in_degree` holds the number
+        of edges that end at each node. Nodes are numbered in the order in which they first appear in the
+        graph, and edges keep the order of the graph.
+    """
+
+    def __init__(self, graph: dict):
+        """
+        Args:
+            graph: dict of source node name to a list of (destination node name, weight) tuples, as in SFG.graph.
+        """
+        self.nodes = []
+        self.node_ids = {}
+        def intern(node):
+            i = self.node_ids.get(node)
+            if i is None:
+                i = self.node_ids[node] = len(self.nodes)
+                self.nodes.append(node)
+            return i
+        edges = []
+        for source,destinations in graph.items():
+            source_id = intern(source)
+            for (destination,weight) in destinations:
+                edges.append((source_id, intern(destination), weight))
+
+        # counting sort by source node ID, which keeps the order of the edges of each node
+        n = len(self.nodes)
+        self.offsets = array('q', [0] * (n+1))
+        self.in_degree = array('q', [0] * n)
+        for (source_id,destination_id,_) in edges:
+            self.offsets[source_id+1] += 1
+            self.in_degree[destination_id] += 1
+        for i in range(n):
+            self.offsets[i+1] += self.offsets[i]
+        self.targets = array('q', [0] * len(edges))
+        self.weights = [None] * len(edges)
+        position = array('q', self.offsets[:n])
+        for (source_id,destination_id,weight) in edges:
+            e = position[source_id]
+            position[source_id] += 1
+            self.targets[e] = destination_id
+            self.weights[e] = weight
+        self._initialize()
+
+
+    @classmethod
+    def from_csr(cls, nodes: list, offsets, targets, weights: list) -> "CompactGraph":
+        """
+        Create a compact graph directly from its CSR layout, e.g. from memory-mapped arrays.
+
+        Args:
+            nodes:   node name for each node ID.
+            offsets: sequence of integers, see the class description; referenced, not copied.
+            targets: sequence of integers, see the class description; referenced, not copied.
+            weights: list with the weight of each edge.
+        """
+        assert len(offsets) == len(nodes) + 1 and len(targets) == len(weights), 'Expecting consistent CSR arrays'
+        graph = cls.__new__(cls)
+        graph.nodes = list(nodes)
+        graph.node_ids = {node: i for i,node in enumerate(graph.nodes)}
+        graph.offsets = offsets
+        graph.targets = targets
+        graph.weights = weights
+        graph.in_degree = array('q', [0] * len(nodes))
+        for destination_id in targets:
+            graph.in_degree[destination_id] += 1
+        graph._initialize()
+        return graph
+
+
+    def __getstate__(self) -> dict:
+        # memory-mapped arrays (see from_csr()) cannot be pickled, e.g. to send the graph to worker processes
+        state = dict(self.__dict__)
+        for name in ('offsets', 'targets'):
+            if isinstance(state[name], memoryview):
+                state[name] = array('q', state[name])
+        return state
+
+
+    def _initialize(self):
+        """ Internal method to derive the zero flags from the weights, and to reset the caches. """
+        self.zero = [is_zero(weight) for weight in self.weights]
+        self._adjacency = {}
+        self._predecessors = {}
+        self._components = {}
+
+
+    def out_edges(self, node_id: int) -> range:
+        """ Get the IDs of all edges that start at the given node. """
+        return range(self.offsets[node_id], self.offsets[node_id+1])
+
+
+    def adjacency(self, include_zero_gain: bool = False) -> list[list[int]]:
+        """ Get the distinct successor IDs of each node, as required by the algorithms in the search module. """
+        if include_zero_gain not in self._adjacency:
+            result = []
+            for v in range(len(self.nodes)):
+                successors = {}
+                for e in self.out_edges(v):
+                    if include_zero_gain or not self.zero[e]:
+                        successors[self.targets[e]] = None
+                result.append(list(successors))
+            self._adjacency[include_zero_gain] = result
+        return self._adjacency[include_zero_gain]
+
+
+    def predecessors(self, include_zero_gain: bool = False) -> list[list[int]]:
+        """ Get the distinct predecessor IDs of each node, i.e. the adjacency list of the reversed graph. """
+        if include_zero_gain not in self._predecessors:
+            result = [[] for _ in self.nodes]
+            for v,successors in enumerate(self.adjacency(include_zero_gain)):
+                for w in successors:
+                    result[w].append(v)
+            self._predecessors[include_zero_gain] = result
+        return self._predecessors[include_zero_gain]
+
+
+    def components(self, include_zero_gain: bool = False) -> list[list[int]]:
+        """
+        Get the strongly connected components (SCCs) of the graph that contain loops, i.e. the components
+            with more than one node, or with a self-loop. Every loop lies entirely within one of them.
+        """
+        if include_zero_gain not in self._components:
+            adjacency = self.adjacency(include_zero_gain)
+            self._components[include_zero_gain] = [c for c in strongly_connected_components(adjacency) if len(c) > 1 or c[0] in adjacency[c[0]]]
+        return self._components[include_zero_gain]
+
+
+    def fingerprint(self) -> "tuple|None":
+        """
+        Get a hashable fingerprint of the graph, which is equal for graphs with the same nodes and edges in the
+            same order, and the same weights; thus equal fingerprints also mean equal node and edge IDs.
+
+        Returns:
+            The fingerprint, or None if any weight is not hashable (e.g. a numpy array).
+        """
+        weights = tuple((type(weight), weight) for weight in self.weights)
+        try:
+            hash(weights)
+        except TypeError:
+            return None
+        return (tuple(self.nodes), self.offsets.tobytes(), self.targets.tobytes(), weights)
+
+
+    def structure_fingerprint(self) -> tuple:
+        """
+        Get a hashable fingerprint of the structure of the graph, like fingerprint(), but without the weights;
+            only whether each weight is zero is included, since zero-weight edges are not part of any loop or path.
+        """
+        return (tuple(self.nodes), self.offsets.tobytes(), self.targets.tobytes(), tuple(self.zero))
+
+
+    def edge_keys(self) -> list[tuple]:
+        """
+        Get a key for each edge ID that identifies the edge independently of the IDs, so it stays valid if
+            other edges are added or removed. The key is (source name, destination name, index), where the index
+            counts the parallel edges between the same nodes.
+        """
+        keys = []
+        for v in range(len(self.nodes)):
+            counts = {}
+            for e in self.out_edges(v):
+                k = counts.get(self.targets[e], 0)
+                counts[self.targets[e]] = k + 1
+                keys.append((self.nodes[v], self.nodes[self.targets[e]], k))
+        return keys
+
+
+    def node_mask(self, node_ids) -> int:
+        """ Get a bitmask with one bit set per given node ID. """
+        mask = 0
+        for i in node_ids:
+            mask |= 1 << i
+        return mask
+
+
+    def gain(self, edges) -> object:
+        """ Get the product of the weights of the given edge IDs. """
+        return product(self.weights[e] for e in edges)
+
+
+    def iter_cycles(self, include_zero_gain: bool = False, nodes: "list[int]|None" = None, starts: "list[int]|None" = None,
+            monitor: "AnalysisMonitor|None" = None) -> Iterator[tuple[list[int],tuple[int,...]]]:
+        """
+        Iterate over all closed loops, each exactly once.
+
+        Args:
+            include_zero_gain: if True, loops with zero gain are also included.
+            nodes:             if given, only loops within these node IDs are searched.
+            starts:            if given, only loops whose lowest node ID is in this list are searched.
+            monitor:           see search.simple_cycles().
+
+        Returns:
+            A generator that yields (node IDs, edge IDs) tuples, where edge i enters node i. Parallel edges
+                result in distinct loops.
+        """
+        adjacency = self.adjacency(include_zero_gain)
+        if starts is not None:
+            cycles = (cycle for start in starts for cycle in cycles_from(adjacency, start, nodes, monitor))
+        else:
+            # search each component separately, so that the search never leaves it
+            components = self.components(include_zero_gain) if nodes is None else [nodes]
+            cycles = (cycle for component in components for cycle in simple_cycles(adjacency, component, monitor))
+        for cycle in cycles:
+            for edges in self._expand([cycle[-1]] + cycle, include_zero_gain):
+                yield cycle, edges
+
+
+    def iter_paths(self, from_id: int, to_id: int, include_zero_gain: bool = False, max_length: "int|None" = None,
+            deadline: "float|None" = None, monitor: "AnalysisMonitor|None" = None) -> Iterator[tuple[list[int],tuple[int,...]]]:
+        """
+        Iterate over all forward paths between two nodes, each exactly once. Nodes from which the destination
+            cannot be reached are never entered.
+
+        Args:
+            from_id:           node ID where the paths start.
+            to_id:             node ID where the paths end.
+            include_zero_gain: if True, paths with zero gain are also included.
+            max_length:        see search.simple_paths().
+            deadline:          see search.simple_paths().
+            monitor:           see search.simple_paths().
+
+        Returns:
+            A generator that yields (node IDs, edge IDs) tuples, where edge i enters node i+1. Parallel edges
+                result in distinct paths.
+        """
+        reachable = reaching(self.predecessors(include_zero_gain), to_id)
+        for path in simple_paths(self.adjacency(include_zero_gain), from_id, to_id, reachable, max_length, deadline, monitor):
+            for edges in self._expand(path, include_zero_gain):
+                yield path, edges
+
+
+    def _expand(self, node_ids: list[int], include_zero_gain: bool) -> Iterator[tuple[int,...]]:
+        """ Internal method to get all combinations of (parallel) edges along a sequence of nodes. """
+        hops = []
+        for i in range(1, len(node_ids)):
+            source_id, destination_id = node_ids[i-1], node_ids[i]
+            hops.append([e for e in self.out_edges(source_id) if self.targets[e] == destination_id and (include_zero_gain or not self.zero[e])])
+        return itertools.product(*hops)
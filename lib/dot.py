@@ -0,0 +1,126 @@
+""" Generation of graphviz DOT text for a SFG, which scales to large graphs.
+
+The nodes are de-duplicated and bucketed by group in a single pass, and the default attributes are emitted
+    only once per (sub)graph, so the DOT text grows linearly with the graph. The text is generated line by line,
+    so it can be written to a file without the graphviz package, and without holding it in memory.
+
+For huge graphs, parallel edges can be aggregated into one edge, and groups can be collapsed into a single
+    summary node, so that graphviz is still able to lay out the graph.
+"""
+
+from typing import Iterable, Iterator
+import os
+
+
+def quote(text) -> str:
+    """ Quote a string as a DOT ID. """
+    return '"' + str(text).replace('"', '\\"') + '"'
+
+
+def attr_list(attrs: dict) -> str:
+    """ Format a dict of attributes as a DOT attribute list, without the brackets. """
+    return ' '.join(f'{key}={quote(value)}' for key,value in attrs.items())
+
+
+def _is_unity(weight) -> bool:
+    """ Internal function to check if a weight is 1; weights that cannot be compared to 1 (e.g. numpy arrays) are not. """
+    try:
+        return bool(weight == 1)
+    except (TypeError, ValueError):
+        return False
+
+
+def body_lines(graph: dict, group_attrs: dict, show_unity_weights: bool = True, aggregate_edges: bool = False,
+        collapse_groups: "Iterable[str]|bool|None" = None) -> Iterator[str]:
+    """
+    Generate the statements of the DOT graph, i.e. the clusters, nodes and edges, but not the default attributes.
+
+    Args:
+        graph:              dict of source node to a list of (destination node, weight) tuples, as in SFG.graph.
+        group_attrs:        attributes of the clusters, and of the summary nodes of collapsed groups.
+        show_unity_weights: if False, edge labels for weights of 1 are hidden.
+        aggregate_edges:    if True, parallel edges are drawn as one edge, labelled with the sum of their weights.
+        collapse_groups:    names of groups that are drawn as a single node, or True to collapse all groups.
+            Edges within a collapsed group are omitted, and the edges between the same pair of nodes
+            outside of it are drawn as one edge, labelled with their number.
+
+    Returns:
+        A generator of DOT lines, each indented by a tab and terminated by a newline, as graphviz.Digraph expects
+            them in its `body`.
+    """
+    groups = {}
+    for source,destinations in graph.items():
+        groups.setdefault(source[0], {})[source] = None
+        for (destination,_) in destinations:
+            groups.setdefault(destination[0], {})[destination] = None
+    if collapse_groups is True:
+        collapsed = {group for group in groups if group is not None}
+    else:
+        collapsed = set(collapse_groups or ()) - {None}
+
+    def node_id(node) -> str:
+        return quote(f'cluster {node[0]}' if node[0] in collapsed else node)
+
+    def label(weight) -> str:
+        return '' if (not show_unity_weights) and _is_unity(weight) else f' [label={quote(weight)}]'
+
+    for i,(group,nodes) in enumerate(groups.items()):
+        if group is None:
+            continue
+        if group in collapsed:
+            summary = f'{group}\\n({len(nodes)} nodes)'
+            yield f'\t{node_id((group,None))} [{attr_list(dict(label=summary, **group_attrs))}]\n'
+            continue
+        yield f'\tsubgraph cluster_{i} {{\n'
+        yield f'\t\tgraph [{attr_list(dict(label=group, **group_attrs))}]\n'
+        for node in nodes:
+            yield f'\t\t{quote(node)} [label={quote(node[1])}]\n'
+        yield '\t}\n'
+    for node in groups.get(None, {}):
+        yield f'\t{quote(node)} [label={quote(node[1])}]\n'
+
+    if not aggregate_edges and not collapsed:
+        for source,destinations in graph.items():
+            for (destination,weight) in destinations:
+                yield f'\t{quote(source)} -> {quote(destination)}{label(weight)}\n'
+        return
+
+    edges = {}
+    for source,destinations in graph.items():
+        for (destination,weight) in destinations:
+            if source[0] in collapsed and source[0] == destination[0]:
+                continue
+            touches_collapsed = source[0] in collapsed or destination[0] in collapsed
+            key = (node_id(source), node_id(destination)) if (aggregate_edges or touches_collapsed) else len(edges)
+            edges.setdefault(key, []).append((source,destination,weight))
+    for parallel in edges.values():
+        (source,destination,weight) = parallel[0]
+        if len(parallel) == 1:
+            text = label(weight)
+        elif source[0] in collapsed or destination[0] in collapsed:
+            text = f' [label={quote(f"{len(parallel)} edges")}]'
+        else:
+            text = f' [label={quote(" + ".join(str(w) for (_,_,w) in parallel))}]'
+        yield f'\t{node_id(source)} -> {node_id(destination)}{text}\n'
+
+
+def write_dot(file, graph: dict, attrs, **kwargs):
+    """
+    Write a complete DOT graph.
+
+    Args:
+        file:   path or text stream to write to.
+        graph:  see body_lines().
+        attrs:  the attributes, as in SFG.GraphAttrPresets.
+        kwargs: see body_lines().
+    """
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, 'w', encoding='utf-8') as stream:
+            write_dot(stream, graph, attrs, **kwargs)
+        return
+    file.write('digraph G {\n')
+    for (statement,defaults) in [('graph', attrs.graph), ('node', attrs.node), ('edge', attrs.edge)]:
+        if defaults:
+            file.write(f'\t{statement} [{attr_list(defaults)}]\n')
+    file.writelines(body_lines(graph, attrs.group, **kwargs))
+    file.write('}\n')
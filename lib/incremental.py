@@ -0,0 +1,485 @@
+""" Incremental analysis, which keeps the loops and the Mason decomposition of a SFG up to date while it is edited. """
+
+from typing import TYPE_CHECKING
+from .cache import AnalysisCache
+from .compact import CompactGraph, is_zero
+from .mason import MasonDecomposition
+from .monitor import AnalysisMonitor, measure
+from .numeric import NumericWeights
+from .polynomial import PolynomialWeights
+from .sweep import compile_weights
+
+if TYPE_CHECKING:
+    from .parallel import WorkerPool
+
+
+class EdgeList(list):
+    """ The list of outgoing (destination, weight) edges of a node in an EditCountingGraph, which counts its edits. """
+
+    __slots__ = ('_owner',)
+
+
+    def _edited(self):
+        """ Internal method to count an edit in the graph that owns this list, which is set by the graph. """
+        owner = getattr(self, '_owner', None)
+        if owner is not None:
+            owner.edits += 1
+
+
+    def __setitem__(self, index, value):
+        self._edited()
+        super().__setitem__(index, value)
+
+
+    def __delitem__(self, index):
+        self._edited()
+        super().__delitem__(index)
+
+
+    def __iadd__(self, edges):
+        self._edited()
+        return super().__iadd__(edges)
+
+
+    def __imul__(self, n):
+        self._edited()
+        return super().__imul__(n)
+
+
+    def append(self, edge):
+        self._edited()
+        super().append(edge)
+
+
+    def extend(self, edges):
+        self._edited()
+        super().extend(edges)
+
+
+    def insert(self, index, edge):
+        self._edited()
+        super().insert(index, edge)
+
+
+    def pop(self, *args):
+        self._edited()
+        return super().pop(*args)
+
+
+    def remove(self, edge):
+        self._edited()
+        super().remove(edge)
+
+
+    def clear(self):
+        self._edited()
+        super().clear()
+
+
+    def sort(self, *args, **kwargs):
+        self._edited()
+        super().sort(*args, **kwargs)
+
+
+    def reverse(self):
+        self._edited()
+        super().reverse()
+
+
+class EditCountingGraph(dict):
+    """
+    The graph of a SFG: a dict of source node to an EdgeList of (destination node, weight) tuples, which
+        creates empty lists for missing nodes like a defaultdict.
+
+    It counts all edits in `edits`, including those that are made directly instead of through the methods of
+        the SFG, so IncrementalAnalysis can tell that its results are outdated. Lists that are assigned to it
+        are copied into an EdgeList, so later edits of the assigned list are not seen.
+    """
+
+    edits = 0
+
+
+    def __init__(self, edges=()):
+        super().__init__()
+        self.update(edges)
+
+
+    def __missing__(self, key):
+        # an empty list does not change the graph, so it is not an edit
+        edges = self._edge_list()
+        super().__setitem__(key, edges)
+        return edges
+
+
+    def __setitem__(self, key, edges):
+        self.edits += 1
+        super().__setitem__(key, edges if type(edges) is EdgeList and getattr(edges, '_owner', None) is self else self._edge_list(edges))
+
+
+    def __delitem__(self, key):
+        self.edits += 1
+        super().__delitem__(key)
+
+
+    def _edge_list(self, edges=()) -> EdgeList:
+        """ Internal method to create a list of edges that is owned by this graph. """
+        result = EdgeList(edges)
+        result._owner = self
+        return result
+
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+
+    def update(self, *args, **kwargs):
+        for (key,edges) in dict(*args, **kwargs).items():
+            self[key] = edges
+
+
+    def setdefault(self, key, default=()):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+
+    def pop(self, *args):
+        self.edits += 1
+        return super().pop(*args)
+
+
+    def popitem(self):
+        self.edits += 1
+        return super().popitem()
+
+
+    def clear(self):
+        self.edits += 1
+        super().clear()
+
+
+class IncrementalAnalysis:
+    """
+    Caches the analysis results of a SFG, and invalidates only what is affected by an edit.
+
+    - If only a weight changes, nothing is searched again; only the loop and path gains are re-calculated.
+    - If edges are added or removed, the loops are cached per strongly connected component (SCC), keyed
+        by the edges of the component. Since loops cannot span multiple SCCs, only the components whose
+        edges changed are searched again.
+    - The loops, the decompositions and the forward paths are also stored in a (possibly shared) LRU cache,
+        keyed by the fingerprint of the graph, so going back to an earlier state of the graph, or analyzing
+        an identical graph, does not calculate anything again.
+    """
+
+    def __init__(self, graph: dict, cache: "AnalysisCache|None" = None):
+        """
+        Args:
+            graph: the graph of the SFG (see SFG.graph); it is referenced, not copied, so later edits are seen.
+                If it is an EditCountingGraph, edits that were not notified are detected as well.
+            cache: the cache for the analysis results; if None, only the results for the current graph are kept.
+        """
+        self.graph = graph
+        self.cache = AnalysisCache(0) if cache is None else cache
+        self._edits = getattr(graph, 'edits', None)
+        self.structure_version = 0
+        self.weights_version = 0
+        self._compact = None
+        self._loops = None
+        self._loop_components = None
+        self._component_loops = {}
+        self._decomposition = None
+        self._decomposition_weights_version = None
+        self._polynomial = None
+        self._polynomial_weights_version = None
+        self._numeric = None
+        self._numeric_weights_version = None
+        self._memoized = {}
+        self._memoized_weights_version = None
+        self._fingerprint = None
+        self._fingerprint_weights_version = None
+        self._structure_fingerprint = None
+        self._structure_fingerprint_version = None
+        self._paths = {}
+        self._paths_structure_version = None
+        self._path_gains = {}
+        self._path_gains_weights_version = None
+        self._compiled_weights = None
+        self._compiled_weights_version = None
+
+
+    def structure_changed(self):
+        """ Notify that edges were added or removed. """
+        self._edits = getattr(self.graph, 'edits', None)
+        self.structure_version += 1
+        self.weights_version += 1
+        self._compact = None
+        self._loops = None
+        self._decomposition = None
+
+
+    def replace_graph(self, graph: dict):
+        """ Analyze another graph from now on, e.g. after SFG.graph was assigned; all results are invalidated. """
+        self.graph = graph
+        self.structure_changed()
+
+
+    def weight_changed(self, source, index: int):
+        """
+        Notify that the weight of an edge changed.
+
+        Args:
+            source: name of the source node of the edge.
+            index:  index of the edge in the list graph[source].
+        """
+        if self._edits is not None and self.graph.edits != self._edits + 1:
+            # other edits were made since the last notification, besides replacing this edge
+            self.structure_changed()
+            return
+        self._edits = self.graph.edits
+        self.weights_version += 1
+        if self._compact is None:
+            return
+        e = self._compact.offsets[self._compact.node_ids[source]] + index
+        weight = self.graph[source][index][1]
+        if is_zero(weight) != self._compact.zero[e]:
+            # zero-weight edges are not part of any loop or path, so this is a structural change
+            self.structure_changed()
+            return
+        self._compact.weights[e] = weight
+
+
+    def check_edits(self):
+        """ Invalidate all results if the graph was edited without notification; see EditCountingGraph. """
+        if self._edits is not None and self.graph.edits != self._edits:
+            self.structure_changed()
+
+
+    def compact(self) -> CompactGraph:
+        """ Get the compact representation of the graph. """
+        self.check_edits()
+        if self._compact is None:
+            self._compact = CompactGraph(self.graph)
+        return self._compact
+
+
+    def restore(self, compact: CompactGraph, loops: "list|None" = None, loop_components: "list[int]|None" = None,
+            decomposition: "MasonDecomposition|None" = None):
+        """
+        Install analysis results that were calculated earlier for the current graph, e.g. loaded from a file.
+
+        Args:
+            compact:         the compact representation of the graph.
+            loops:           if given, the loops; see loops().
+            loop_components: if loops are given, the component index of each loop.
+            decomposition:   if given, the Mason decomposition for the current weights; requires the loops.
+        """
+        self.structure_changed()
+        self._compact = compact
+        if loops is not None:
+            self._loops = loops
+            self._loop_components = loop_components
+            if decomposition is not None:
+                self._decomposition = decomposition
+                self._decomposition_weights_version = self.weights_version
+
+
+    def fingerprint(self) -> "tuple|None":
+        """ Get the fingerprint of the current graph and weights; see CompactGraph.fingerprint(). """
+        self.check_edits()
+        if self._fingerprint_weights_version != self.weights_version:
+            self._fingerprint = self.compact().fingerprint()
+            self._fingerprint_weights_version = self.weights_version
+        return self._fingerprint
+
+
+    def structure_fingerprint(self) -> tuple:
+        """ Get the fingerprint of the structure of the current graph; see CompactGraph.structure_fingerprint(). """
+        self.check_edits()
+        if self._structure_fingerprint_version != self.structure_version:
+            self._structure_fingerprint = self.compact().structure_fingerprint()
+            self._structure_fingerprint_version = self.structure_version
+        return self._structure_fingerprint
+
+
+    def loops(self, pool: "WorkerPool|None" = None, monitor: "AnalysisMonitor|None" = None) -> list[tuple[list[int],tuple[int,...]]]:
+        """
+        Get all loops with non-zero gain, as (node IDs, edge IDs) tuples; see CompactGraph.iter_cycles().
+
+        Args:
+            pool:    if given, components that need to be searched are searched in parallel by this pool.
+            monitor: if given, the search is measured as phase 'loops', with one step per component.
+        """
+        self.check_edits()
+        if self._loops is None:
+            graph = self.compact()
+            keys = graph.edge_keys()
+            component_loops = {}
+            loops, loop_components = [], []
+            components = graph.components(include_zero_gain=False)
+            with measure(monitor, 'loops', len(components)):
+                for (c,component) in enumerate(components):
+                    members = set(component)
+                    edges = [e for v in component for e in graph.out_edges(v) if not graph.zero[e] and graph.targets[e] in members]
+                    signature = frozenset(keys[e] for e in edges)
+                    cached = self._component_loops.get(signature)
+                    if cached is None:
+                        def search():
+                            found = pool.find_cycles(False, component) if pool is not None else graph.iter_cycles(include_zero_gain=False, nodes=component, monitor=monitor)
+                            return [tuple(keys[e] for e in loop_edges) for (_,loop_edges) in found]
+                        cached = self.cache.get(('loops', signature), search)
+                    component_loops[signature] = cached
+                    edge_ids = {keys[e]: e for e in edges}
+                    for loop in cached:
+                        loop_edges = tuple(edge_ids[key] for key in loop)
+                        loops.append(([graph.targets[e] for e in loop_edges], loop_edges))
+                        loop_components.append(c)
+                    if monitor is not None:
+                        monitor.count('loops', len(cached))
+                        monitor.peak('loops per component', len(cached))
+                        monitor.advance()
+            self._component_loops = component_loops
+            self._loops = loops
+            self._loop_components = loop_components
+        return self._loops
+
+
+    def loop_components(self, pool: "WorkerPool|None" = None) -> list[int]:
+        """ Get the index of the SCC of each loop, in the order of loops(); see CompactGraph.components(). """
+        self.loops(pool)
+        return self._loop_components
+
+
+    def decomposition(self, pool: "WorkerPool|None" = None, monitor: "AnalysisMonitor|None" = None) -> MasonDecomposition:
+        """
+        Get the Mason decomposition for the current graph and weights.
+
+        Args:
+            pool:    see loops().
+            monitor: see loops().
+        """
+        self.check_edits()
+        if self._decomposition_weights_version != self.weights_version:
+            def calculate():
+                graph = self.compact()
+                loops = self.loops(pool, monitor)
+                gains = [graph.gain(edges) for (_,edges) in loops]
+                if self._decomposition is None:
+                    return MasonDecomposition([graph.node_mask(node_ids) for (node_ids,_) in loops], gains, self._loop_components)
+                return self._decomposition.with_gains(gains)
+            self._decomposition = self.cache.get(self._key('decomposition'), calculate)
+            self._decomposition_weights_version = self.weights_version
+        return self._decomposition
+
+
+    def polynomial_decomposition(self, pool: "WorkerPool|None" = None, monitor: "AnalysisMonitor|None" = None) -> tuple[MasonDecomposition,PolynomialWeights]:
+        """
+        Get the Mason decomposition with the loop gains as sparse polynomials, and the polynomial edge weights
+            (requires sympy); see the polynomial module.
+
+        Args:
+            pool:    see loops().
+            monitor: see loops().
+        """
+        self.check_edits()
+        if self._polynomial_weights_version != self.weights_version:
+            def calculate():
+                decomposition = self.decomposition(pool, monitor)
+                weights = PolynomialWeights(self.compact())
+                return (decomposition.with_gains([weights.gain(edges) for (_,edges) in self.loops()]), weights)
+            self._polynomial = self.cache.get(self._key('polynomial'), calculate)
+            self._polynomial_weights_version = self.weights_version
+        return self._polynomial
+
+
+    def numeric_decomposition(self, pool: "WorkerPool|None" = None, monitor: "AnalysisMonitor|None" = None) -> tuple[MasonDecomposition,NumericWeights]:
+        """
+        Get the Mason decomposition with the loop gains as rows of a numpy matrix, and the numeric edge weights
+            (requires numpy); see the numeric module.
+
+        Args:
+            pool:    see loops().
+            monitor: see loops().
+        """
+        self.check_edits()
+        if self._numeric_weights_version != self.weights_version:
+            def calculate():
+                decomposition = self.decomposition(pool, monitor)
+                weights = NumericWeights(self.compact())
+                return (weights.decomposition(decomposition, self.loops()), weights)
+            self._numeric = self.cache.get(self._key('numeric'), calculate)
+            self._numeric_weights_version = self.weights_version
+        return self._numeric
+
+
+    def compiled_weights(self) -> list:
+        """ Get the weights compiled for sweeps (requires numpy, and sympy for symbolic weights); see sweep.compile_weights(). """
+        self.check_edits()
+        if self._compiled_weights_version != self.weights_version:
+            self._compiled_weights = compile_weights(self.compact())
+            self._compiled_weights_version = self.weights_version
+        return self._compiled_weights
+
+
+    def paths(self, from_id: int, to_id: int, weights: "PolynomialWeights|NumericWeights|None" = None, monitor: "AnalysisMonitor|None" = None) -> list[tuple]:
+        """
+        Get the forward paths with non-zero gain between two nodes, as required by MasonDecomposition.gain().
+
+        Args:
+            from_id: node ID where the paths start.
+            to_id:   node ID where the paths end.
+            weights: if given, the path gains are calculated from these converted weights.
+            monitor: if given, the search is measured as phase 'paths'.
+
+        Returns:
+            A list of (node mask, path gain) tuples.
+        """
+        graph = self.compact()
+        if self._path_gains_weights_version != self.weights_version:
+            self._path_gains = {}
+            self._path_gains_weights_version = self.weights_version
+        key = (from_id, to_id, None if weights is None else type(weights).__name__)
+        paths = self._path_gains.get(key)
+        if paths is None:
+            # the paths only depend on the structure, so only their gains are calculated again after a weight
+            # changed; the cache only shares them with other SFGs, so this does not depend on its size
+            if self._paths_structure_version != self.structure_version:
+                self._paths = {}
+                self._paths_structure_version = self.structure_version
+            found = self._paths.get((from_id, to_id))
+            if found is None:
+                def find():
+                    with measure(monitor, 'paths'):
+                        return [(graph.node_mask(node_ids), edges) for (node_ids,edges) in graph.iter_paths(from_id, to_id, monitor=monitor)]
+                found = self._paths[(from_id, to_id)] = self.cache.get(('paths', from_id, to_id, self.structure_fingerprint()), find)
+            path_gain = graph.gain if weights is None else weights.gain
+            paths = self._path_gains[key] = [(mask, path_gain(edges)) for (mask,edges) in found]
+        if monitor is not None:
+            monitor.count('paths', len(paths))
+            monitor.peak('paths per pair', len(paths))
+        return paths
+
+
+    def memoize(self, key: tuple, calculate):
+        """
+        Get a result for the current graph and weights that is memoized until the next edit, e.g. the
+            port-to-port gain matrix of a block (see SFG.reduce()), the reduced graph for a set of pairs, or a
+            compiled sensitivity function (see SFG.sensitivities()).
+
+        Args:
+            key:       hashable description of the result.
+            calculate: function without arguments that calculates the result.
+        """
+        self.check_edits()
+        if self._memoized_weights_version != self.weights_version:
+            self._memoized = {}
+            self._memoized_weights_version = self.weights_version
+        if key not in self._memoized:
+            self._memoized[key] = calculate()
+        return self._memoized[key]
+
+
+    def _key(self, *kind) -> "tuple|None":
+        """ Internal method to get the cache key of a result for the current graph, or None if it cannot be cached. """
+        fingerprint = self.fingerprint()
+        return None if fingerprint is None else (*kind, fingerprint)
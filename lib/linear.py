@@ -0,0 +1,75 @@
+""" Linear-solve backend, which calculates gains as entries of (I - A)⁻¹ instead of using Mason's gain formula.
+
+The node values x of a SFG with the weighted adjacency matrix A (where A[j,i] is the weight of the edge from
+    node i to node j) satisfy x = A·x + u, where u is the signal injected into the nodes. So the gain from
+    node i to node j is the entry [j,i] of (I - A)⁻¹. This only works if all weights are numeric, but it
+    takes polynomial time, whereas Mason's formula needs to enumerate all loops.
+
+Requires the numpy and scipy packages.
+"""
+
+from .compact import CompactGraph
+
+
+class LinearSolver:
+    """ Sparse LU factorization of (I - A), which is done once, and then shared by any number of gain queries. """
+
+    def __init__(self, graph: CompactGraph):
+        """
+        Args:
+            graph: the SFG to solve.
+        """
+        import numpy
+        import scipy.sparse
+        import scipy.sparse.linalg
+
+        self.node_ids = graph.node_ids
+        rows, cols, data = [], [], []
+        for source_id in range(len(graph.nodes)):
+            for e in graph.out_edges(source_id):
+                if graph.zero[e]:
+                    continue
+                weight = graph.weights[e]
+                try:
+                    value = complex(weight)
+                except TypeError:
+                    raise ValueError(f'Weight {weight} of the edge {graph.nodes[source_id]} -> {graph.nodes[graph.targets[e]]} is not numeric; the linear method requires numeric weights')
+                rows.append(graph.targets[e])
+                cols.append(source_id)
+                data.append(value)
+        self.is_complex = any(value.imag != 0 for value in data)
+        dtype = complex if self.is_complex else float
+        if not self.is_complex:
+            data = [value.real for value in data]
+
+        n = len(graph.nodes)
+        a = scipy.sparse.coo_matrix((numpy.array(data, dtype=dtype), (rows, cols)), shape=(n, n))
+        self._numpy = numpy
+        self._lu = scipy.sparse.linalg.splu((scipy.sparse.identity(n, dtype=dtype, format='csc') - a).tocsc())
+
+
+    def gains(self, pairs: "list[tuple]") -> list:
+        """
+        Calculate the gains between pairs of nodes.
+
+        Args:
+            pairs: list of (from_node, to_node) tuples, with names as (group,name) tuples.
+
+        Returns:
+            A list with the gain for each pair, as float, or as complex if any weight is complex.
+        """
+        numpy = self._numpy
+        for pair in pairs:
+            for node in pair:
+                if node not in self.node_ids:
+                    raise ValueError(f'Node {node} does not exist')
+
+        # one right-hand side per distinct source node
+        source_columns = {}
+        for (from_node,_) in pairs:
+            source_columns.setdefault(self.node_ids[from_node], len(source_columns))
+        rhs = numpy.zeros((len(self.node_ids), len(source_columns)), dtype=complex if self.is_complex else float)
+        for source_id,column in source_columns.items():
+            rhs[source_id,column] = 1
+        x = self._lu.solve(rhs)
+        return [x[self.node_ids[to_node], source_columns[self.node_ids[from_node]]].item() for (from_node,to_node) in pairs]
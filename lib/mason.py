@@ -0,0 +1,239 @@
+""" Building blocks for Mason's gain formula. """
+
+import copy
+from .monitor import AnalysisMonitor
+
+
+def product(factors):
+    """ Multiply all factors, using only the * operator, so that any weight type can be used. """
+    Π = 1
+    for f in factors:
+        Π = Π * f
+    return Π
+
+
+class NonTouchingLoops:
+    """
+    Enumerates sets of mutually non-touching loops, as required for the determinant Δ and the cofactors Δₖ.
+
+    The node set of each loop is stored as an integer bitmask, and the non-touching relation between the loops
+        is stored as one bitmask over the loop indices per loop. The sets are grown one loop at a time, and only
+        loops that touch none of the already chosen loops are candidates for the next one, so combinations of
+        touching loops are never examined.
+    """
+
+    def __init__(self, masks: list[int], gains: list):
+        """
+        Args:
+            masks: for each loop, the bitmask of the node IDs it traverses.
+            gains: for each loop, the loop gain, i.e. the product of its weights.
+        """
+        assert len(masks) == len(gains), 'Expecting one mask per loop gain'
+        self.masks = masks
+        self.gains = gains
+        self.non_touching = [0] * len(masks)
+        for i in range(len(masks)):
+            for j in range(i+1, len(masks)):
+                if masks[i] & masks[j] == 0:
+                    self.non_touching[i] |= 1 << j
+                    self.non_touching[j] |= 1 << i
+
+
+    def with_gains(self, gains: list) -> "NonTouchingLoops":
+        """ Get a copy with different loop gains, which shares the non-touching relation with this one. """
+        assert len(gains) == len(self.masks), 'Expecting one gain per loop'
+        result = copy.copy(self)
+        result.gains = gains
+        return result
+
+
+    def cofactor(self, excluded_mask: int = 0, monitor: "AnalysisMonitor|None" = None):
+        """
+        Calculate the determinant Δ = 1 - ΣLᵢ + ΣLᵢLⱼ - ..., summing over all sets of mutually non-touching loops.
+
+        Args:
+            excluded_mask: bitmask of node IDs; loops that touch any of these nodes are ignored. Provide
+                the nodes of a forward path to get the cofactor Δₖ of that path.
+            monitor:       if given, the loop sets are counted, and cancellation is checked regularly.
+        """
+        return 1 + self.partial_cofactor(excluded_mask, monitor=monitor)
+
+
+    def partial_cofactor(self, excluded_mask: int = 0, first_loops: "list[int]|None" = None, monitor: "AnalysisMonitor|None" = None):
+        """
+        Calculate a part of the sum in cofactor(), without the leading 1. Partial sums over disjoint lists of
+            first loops add up to the complete sum, so they can e.g. be calculated by multiple processes.
+
+        Args:
+            excluded_mask: see cofactor().
+            first_loops:   if given, only sets whose lowest loop index is in this list are included.
+            monitor:       see cofactor().
+        """
+        allowed = self._allowed(excluded_mask)
+        if first_loops is None:
+            first_loops = range(len(self.masks))
+        Σ = 0
+        sets = 0
+        reported = 0
+        for i in first_loops:
+            if not allowed & (1 << i):
+                continue
+            term = self.gains[i]
+            Σ += -term
+            sets += 1
+            # only loops with higher indices, so that each set is only found from its lowest loop
+            stack = [(term, 1, allowed & self.non_touching[i] & ~((2 << i) - 1))]
+            while stack:
+                Π, sign, candidates = stack.pop()
+                if monitor is not None:
+                    # each candidate extends the popped set to a new set
+                    sets += bin(candidates).count('1')
+                    if sets - reported >= AnalysisMonitor.CHECK_INTERVAL:
+                        monitor.count('loop sets', sets - reported)
+                        monitor.check()
+                        reported = sets
+                while candidates:
+                    low = candidates & -candidates
+                    candidates ^= low
+                    j = low.bit_length() - 1
+                    term = Π * self.gains[j]
+                    Σ += sign * term
+                    remaining = candidates & self.non_touching[j]
+                    if remaining:
+                        stack.append((term, -sign, remaining))
+        if monitor is not None:
+            monitor.count('loop sets', sets - reported)
+            monitor.peak('loop sets per cofactor', sets)
+        return Σ
+
+
+    def _allowed(self, excluded_mask: int) -> int:
+        """ Internal method to get the bitmask of all loop indices that do not touch the excluded nodes. """
+        allowed = 0
+        for i,mask in enumerate(self.masks):
+            if mask & excluded_mask == 0:
+                allowed |= 1 << i
+        return allowed
+
+
+class MasonDecomposition:
+    """
+    The loops of a SFG, their gains, the non-touching loop sets and the determinant Δ, computed once, so that
+        any number of gains can be calculated from them.
+
+    Loops in different strongly connected components (SCCs) of the SFG never touch, so the determinant is the
+        product of the determinants of the components, Δ = ΠΔᵢ, and the same holds for each cofactor. Thus the
+        non-touching loop sets are only enumerated within each component, and components that are not touched
+        by any forward path cancel out of the gain.
+
+    Cofactors are memoized per component by the set of excluded nodes, so forward paths that touch the same loop
+        nodes share their cofactor, even across different (source, sink) pairs.
+    """
+
+    def __init__(self, masks: list[int], gains: list, components: "list[int]|None" = None):
+        """
+        Args:
+            masks:      for each loop of the SFG, the bitmask of the node IDs it traverses.
+            gains:      for each loop of the SFG, the loop gain.
+            components: for each loop of the SFG, the index of the SCC it belongs to. If None, all loops
+                are treated as one component.
+        """
+        if components is None:
+            components = [0] * len(masks)
+        indices = {}
+        for i,component in enumerate(components):
+            indices.setdefault(component, []).append(i)
+        self.loop_indices = list(indices.values())
+        self.components = [NonTouchingLoops([masks[i] for i in loops], [gains[i] for i in loops]) for loops in self.loop_indices]
+        self.component_masks = []
+        for loops in self.loop_indices:
+            component_mask = 0
+            for i in loops:
+                component_mask |= masks[i]
+            self.component_masks.append(component_mask)
+        self._cofactors = {}
+
+
+    def with_gains(self, gains: list) -> "MasonDecomposition":
+        """ Get a copy with different loop gains, e.g. after edge weights changed; the loop structure is reused. """
+        result = copy.copy(self)
+        result.components = [c.with_gains([gains[i] for i in loops]) for c,loops in zip(self.components, self.loop_indices)]
+        result._cofactors = {}
+        return result
+
+
+    def cofactor(self, excluded_mask: int = 0, components: "list[int]|None" = None, monitor: "AnalysisMonitor|None" = None):
+        """
+        Get the cofactor for the nodes in the given bitmask; see NonTouchingLoops.cofactor().
+
+        Args:
+            excluded_mask: bitmask of node IDs; loops that touch any of these nodes are ignored.
+            components:    indices of the components to include; if None, all components are included.
+            monitor:       if given, the calculated and memoized cofactors and the loop sets are counted.
+        """
+        Δ = 1
+        for c in (range(len(self.components)) if components is None else components):
+            # nodes that are not part of the component do not change its cofactor
+            key = (c, excluded_mask & self.component_masks[c])
+            if key not in self._cofactors:
+                self._cofactors[key] = self.components[c].cofactor(key[1], monitor)
+                if monitor is not None:
+                    monitor.count('cofactors')
+            elif monitor is not None:
+                monitor.count('cofactor cache hits')
+            Δ = Δ * self._cofactors[key]
+        return Δ
+
+
+    def relevant_components(self, paths: list) -> list[int]:
+        """ Get the indices of the components that are touched by any of the given forward paths; see gain(). """
+        touched_mask = 0
+        for (mask,_) in paths:
+            touched_mask |= mask
+        return [c for c,component_mask in enumerate(self.component_masks) if component_mask & touched_mask]
+
+
+    def missing_cofactors(self, paths: list) -> list[tuple[int,int]]:
+        """ Get the (component index, excluded mask) keys of all cofactors that gain() needs, but which are not yet calculated. """
+        keys = {}
+        for c in self.relevant_components(paths):
+            for mask in [0] + [mask for (mask,_) in paths]:
+                key = (c, mask & self.component_masks[c])
+                if key not in self._cofactors:
+                    keys[key] = None
+        return list(keys)
+
+
+    def calculate_cofactors(self, keys: list[tuple[int,int]], monitor: "AnalysisMonitor|None" = None):
+        """
+        Calculate and memoize cofactors in advance, e.g. to measure them as a separate phase.
+
+        Args:
+            keys:    (component index, excluded mask) tuples; see missing_cofactors().
+            monitor: see cofactor(); each key advances the progress of the current phase by one step.
+        """
+        for (c,mask) in keys:
+            self.cofactor(mask, [c], monitor)
+            if monitor is not None:
+                monitor.advance()
+
+
+    def store_cofactor(self, key: tuple[int,int], cofactor):
+        """ Store a cofactor that was calculated elsewhere, e.g. in another process; see missing_cofactors(). """
+        self._cofactors[key] = cofactor
+
+
+    def gain(self, paths: list, monitor: "AnalysisMonitor|None" = None):
+        """
+        Calculate the gain Σ(Pₖ·Δₖ)/Δ.
+
+        Args:
+            paths:   for each forward path from the source to the sink, a tuple (bitmask of the node IDs it traverses, path gain).
+            monitor: see cofactor().
+        """
+        # the determinants of untouched components are part of every Δₖ and of Δ, so they cancel out
+        relevant = self.relevant_components(paths)
+        Σ = 0
+        for (mask,path_gain) in paths:
+            Σ += path_gain * self.cofactor(mask, relevant, monitor)
+        return Σ / self.cofactor(0, relevant, monitor)
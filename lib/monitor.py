@@ -0,0 +1,137 @@
+""" Opt-in instrumentation of the analysis: statistics, progress reports, and cooperative cancellation. """
+
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Iterator
+import time
+
+
+class AnalysisCancelled(Exception):
+    """ Raised by an analysis that was cancelled through its AnalysisMonitor. """
+
+
+class AnalysisMonitor:
+    """
+    Collects statistics of an analysis, reports its progress, and allows to cancel it. Pass it as the `monitor`
+        argument to the analysis methods of SFG; one monitor can be used for multiple calls, and accumulates
+        their statistics.
+
+    The statistics are:
+    - `counts`: 'loops' (found, or taken from the cache), 'loop search steps' (DFS steps of the loop search),
+        'paths', 'path search steps', 'loop sets' (sets of non-touching loops summed up in the cofactors),
+        'cofactors' (calculated) and 'cofactor cache hits' (cofactors taken from those memoized earlier).
+    - `seconds`: the time spent in each phase, i.e. 'loops', 'paths', 'cofactors' and 'gains'.
+    - `peaks`: 'loops per component', 'paths per pair', 'search depth' and 'loop sets per cofactor'.
+
+    The hot loops of the analysis call check() regularly, which raises AnalysisCancelled once cancel() was
+        called (e.g. from another thread, or from the progress callback), and calls the progress callback.
+        With worker processes, only the phases are measured, and cancellation is only checked between them.
+    """
+
+    CHECK_INTERVAL = 1024
+    """ Number of steps between two calls of check() in the hot loops. """
+
+
+    def __init__(self, progress: "Callable[[AnalysisMonitor],None]|None" = None, interval: float = 1.0):
+        """
+        Args:
+            progress: if given, a function that is called with this monitor at most every `interval` seconds,
+                and at the end of each phase. The current state is in the attributes `phase`, `done`,
+                `total` (None if unknown), `elapsed` and `eta` (None if unknown).
+            interval: minimum time between two calls of the progress function, in seconds.
+        """
+        self.progress = progress
+        self.interval = interval
+        self.counts = {}
+        self.seconds = {}
+        self.peaks = {}
+        self.phase = None
+        self.done = 0
+        self.total = None
+        self._phase_start = None
+        self._last_report = time.monotonic()
+        self._cancelled = False
+
+
+    def cancel(self):
+        """ Request the analysis to stop; it raises AnalysisCancelled at its next check. """
+        self._cancelled = True
+
+
+    @property
+    def cancelled(self) -> bool:
+        """ True if cancel() was called. """
+        return self._cancelled
+
+
+    @property
+    def elapsed(self) -> float:
+        """ Time since the start of the current phase, in seconds. """
+        return 0.0 if self._phase_start is None else time.perf_counter() - self._phase_start
+
+
+    @property
+    def eta(self) -> "float|None":
+        """ Estimated remaining time of the current phase in seconds, or None if the total is unknown. """
+        if not self.total or not self.done:
+            return None
+        return self.elapsed * (self.total - self.done) / self.done
+
+
+    def count(self, name: str, n: int = 1):
+        """ Increment a counter. """
+        self.counts[name] = self.counts.get(name, 0) + n
+
+
+    def peak(self, name: str, value: int):
+        """ Record a size, of which only the maximum is kept. """
+        if value > self.peaks.get(name, 0):
+            self.peaks[name] = value
+
+
+    @contextmanager
+    def measure(self, phase: str, total: "int|None" = None) -> Iterator["AnalysisMonitor"]:
+        """
+        Context manager for a phase of the analysis, which measures its time, and tracks its progress.
+
+        Args:
+            phase: name of the phase.
+            total: number of steps of the phase (see advance()), if known.
+        """
+        outer = (self.phase, self.done, self.total, self._phase_start)
+        self.phase, self.done, self.total, self._phase_start = phase, 0, total, time.perf_counter()
+        try:
+            self.check()
+            yield self
+        finally:
+            self.seconds[phase] = self.seconds.get(phase, 0.0) + self.elapsed
+            if self.progress is not None:
+                self.progress(self)
+            self.phase, self.done, self.total, self._phase_start = outer
+
+
+    def advance(self, steps: int = 1):
+        """ Advance the progress of the current phase, and check(). """
+        self.done += steps
+        self.check()
+
+
+    def check(self):
+        """ Raise AnalysisCancelled if the analysis was cancelled, and call the progress function if it is due. """
+        if self._cancelled:
+            raise AnalysisCancelled(f'Analysis cancelled in phase {self.phase}')
+        if self.progress is not None and time.monotonic() - self._last_report >= self.interval:
+            self._last_report = time.monotonic()
+            self.progress(self)
+
+
+    def report(self) -> str:
+        """ Format all statistics as text, one per line. """
+        lines = [f'{name + " [s]":<28} {seconds:.3f}' for name,seconds in self.seconds.items()]
+        lines += [f'{name:<28} {count}' for name,count in self.counts.items()]
+        lines += [f'{"max. " + name:<28} {value}' for name,value in self.peaks.items()]
+        return '\n'.join(lines)
+
+
+def measure(monitor: "AnalysisMonitor|None", phase: str, total: "int|None" = None):
+    """ Get AnalysisMonitor.measure() if there is a monitor, or else a context manager that does nothing. """
+    return nullcontext() if monitor is None else monitor.measure(phase, total)
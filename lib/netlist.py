@@ -0,0 +1,89 @@
+""" Streaming loader for SFG netlists, in the text format of `samples/06_parser.py`:
+
+    # comments and empty lines are ignored
+    A.1a -> A.1b: S11a      edge with a weight, which is a number, or a sympy expression
+    Port1.a -> A.1a         edge with the weight 1
+    Port1.a => Port1.b      (source, sink) pair whose gain is of interest
+
+Symbolic weights require the sympy package.
+"""
+
+from typing import Iterator
+import os
+import re
+
+
+_EDGE = re.compile(r'\s*([\w\.]+)\s*(->|=>)\s*([\w\.]+)(?:\s*:\s*(\S.*?))?\s*')
+
+
+class _WeightParser:
+    """ Parses weights, and memoizes them, so that repeated symbols are only created once. """
+
+    def __init__(self):
+        self._weights = {}
+        self._sympy = None
+
+
+    def __call__(self, text: str):
+        weight = self._weights.get(text)
+        if weight is None:
+            weight = self._weights[text] = self._parse(text)
+        return weight
+
+
+    def _parse(self, text: str):
+        """ Internal method to parse a weight that was not seen before. """
+        for number_type in (int, float, complex):
+            try:
+                return number_type(text)
+            except ValueError:
+                pass
+        if self._sympy is None:
+            import sympy
+            self._sympy = sympy
+        if text.isidentifier():
+            return self._sympy.Symbol(text)
+        try:
+            return self._sympy.sympify(text)
+        except self._sympy.SympifyError:
+            raise ValueError(f'Unable to parse the weight "{text}"')
+
+
+def read_netlist(file) -> tuple[Iterator[tuple],list[tuple[str,str]]]:
+    """
+    Parse a netlist lazily.
+
+    Args:
+        file: path of the netlist, or an iterable of lines, e.g. a text file object.
+
+    Returns:
+        A tuple (edges, pairs): a generator of (from_node, to_node, weight) tuples, which reads the netlist
+            line by line while it is consumed, and a list that is filled with the (from_node, to_node) tuples
+            of the `=>` lines, once the generator is exhausted.
+    """
+    pairs = []
+    return _parse_lines(file, pairs), pairs
+
+
+def _parse_lines(file, pairs: list) -> Iterator[tuple]:
+    """ Internal function that generates the edges of a netlist, and collects its pairs; see read_netlist(). """
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, encoding='utf-8') as lines:
+            yield from _parse_lines(lines, pairs)
+        return
+    parse_weight = _WeightParser()
+    fullmatch = _EDGE.fullmatch
+    for (number,line) in enumerate(file, 1):
+        m = fullmatch(line)
+        if m is None:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            raise ValueError(f'Unable to parse line {number}: "{line}"')
+        src, arrow, dst, weight = m.groups()
+        if arrow == '=>':
+            if weight is not None:
+                raise ValueError(f'Unexpected weight in line {number}: "{line.strip()}"')
+            pairs.append((src, dst))
+        else:
+            yield (src, dst, 1 if weight is None else parse_weight(weight))
@@ -0,0 +1,146 @@
+""" Vectorized evaluation of Mason's gain formula for numeric weights, e.g. with one value per frequency point.
+
+Mason's gain formula evaluated with the generic operators costs one Python-level multiplication per loop set,
+    and with array weights also one small numpy operation per loop set. Here, the loop gains of each component
+    are stacked into one matrix (loops × points), and the non-touching loop sets are enumerated in blocks: each
+    block holds the products of many loop sets as the rows of a matrix, and the candidate loops for extending
+    them as a boolean matrix. Extending all sets of a block by one loop, and summing them up, are then a handful
+    of numpy operations, so one pass yields the gain for all points at once.
+
+Requires the numpy package.
+"""
+
+from .compact import CompactGraph
+from .mason import MasonDecomposition, NonTouchingLoops
+from .monitor import AnalysisMonitor
+
+
+class VectorizedLoops(NonTouchingLoops):
+    """
+    Non-touching loop sets whose gains are the rows of a numpy matrix, with vectorized cofactors.
+
+    The cofactors are numpy arrays with one value per point, so MasonDecomposition.gain() works unchanged.
+    """
+
+    BLOCK_ELEMENTS = 1 << 15
+    """ Approximate number of gains per block of loop sets, which bounds the memory per level. """
+
+
+    def __init__(self, loops: NonTouchingLoops, gains):
+        """
+        Args:
+            loops: the loops, whose non-touching relation is shared.
+            gains: matrix with one row of gains per loop.
+        """
+        import numpy
+
+        assert len(gains) == len(loops.masks), 'Expecting one gain per loop'
+        self.masks = loops.masks
+        self.non_touching = loops.non_touching
+        self.gains = gains
+        count = len(self.masks)
+        size = max(1, (count + 7) // 8)
+        rows = [numpy.frombuffer(mask.to_bytes(size, 'little'), dtype=numpy.uint8) for mask in self.non_touching]
+        self.non_touching_matrix = numpy.unpackbits(numpy.array(rows, dtype=numpy.uint8).reshape(count, size), axis=1, bitorder='little')[:, :count].astype(bool)
+        # only loops with higher indices are candidates, so that each set is only found from its lowest loop
+        self.higher = numpy.triu(numpy.ones((count, count), dtype=bool), 1)
+
+
+    def partial_cofactor(self, excluded_mask: int = 0, first_loops: "list[int]|None" = None, monitor: "AnalysisMonitor|None" = None):
+        """ See NonTouchingLoops.partial_cofactor(); returns an array with one value per point. """
+        import numpy
+
+        allowed_mask = self._allowed(excluded_mask)
+        allowed = numpy.array([bool(allowed_mask >> i & 1) for i in range(len(self.masks))], dtype=bool)
+        first = [i for i in (range(len(self.masks)) if first_loops is None else first_loops) if allowed[i]]
+        gains = self.gains
+        Σ = numpy.zeros(gains.shape[1:], dtype=gains.dtype)
+        if not first:
+            return Σ
+        # blocks of the size of the CPU cache are the fastest; larger ones are limited by the memory bandwidth
+        block_rows = max(16, self.BLOCK_ELEMENTS // max(1, Σ.size))
+
+        sets = 0
+        def add(products, sign: int):
+            nonlocal Σ, sets
+            Σ += sign * products.sum(axis=0)
+            sets += len(products)
+            if monitor is not None:
+                monitor.count('loop sets', len(products))
+                monitor.check()
+
+        first = numpy.array(first)
+        candidates = self.non_touching_matrix[first] & self.higher[first] & allowed
+        add(gains[first], -1)
+        # each entry holds a block of sets, their candidates, and the position of the next extensions to process
+        stack = [(gains[first], candidates, -1, *numpy.nonzero(candidates), 0)]
+        while stack:
+            products, candidates, sign, rows, loops, position = stack.pop()
+            if position >= len(rows):
+                continue
+            stack.append((products, candidates, sign, rows, loops, position + block_rows))
+            rows, loops = rows[position:position+block_rows], loops[position:position+block_rows]
+            products = products[rows] * gains[loops]
+            add(products, -sign)
+            candidates = candidates[rows] & self.non_touching_matrix[loops] & self.higher[loops]
+            # sets that cannot be extended any further are done
+            keep = candidates.any(axis=1)
+            if keep.any():
+                products, candidates = products[keep], candidates[keep]
+                stack.append((products, candidates, -sign, *numpy.nonzero(candidates), 0))
+        if monitor is not None:
+            monitor.peak('loop sets per cofactor', sets)
+        return Σ
+
+
+class NumericWeights:
+    """
+    The edge weights of a compact graph as a numpy matrix, with one row per edge and one column per point.
+
+    All weights are broadcast against each other, so scalar weights apply to all points.
+    """
+
+    def __init__(self, graph: CompactGraph):
+        """
+        Args:
+            graph: the graph whose weights are converted; weights must be numbers or numeric arrays.
+        """
+        import numpy
+
+        values = [numpy.asarray(weight) for weight in graph.weights]
+        for (weight,value) in zip(graph.weights, values):
+            if value.dtype.kind not in 'biufc':
+                raise ValueError(f'Weight {weight} is not numeric; the numeric method requires numbers or numeric arrays')
+        self.shape = numpy.broadcast_shapes(*[value.shape for value in values])
+        dtype = numpy.result_type(float, *values)
+        self.edges = numpy.empty((len(values), max(1, int(numpy.prod(self.shape)))), dtype=dtype)
+        for (e,value) in enumerate(values):
+            self.edges[e] = numpy.broadcast_to(value, self.shape).reshape(-1)
+
+
+    def gain(self, edges):
+        """ Get the products of the weights of the given edge IDs, one per point. """
+        return self.edges[list(edges)].prod(axis=0)
+
+
+    def decomposition(self, decomposition: MasonDecomposition, loops: list) -> MasonDecomposition:
+        """
+        Get a copy of a Mason decomposition with vectorized loop gains.
+
+        Args:
+            decomposition: the decomposition, which provides the loop structure.
+            loops:         the loops as (node IDs, edge IDs) tuples, in the order of the decomposition.
+        """
+        import numpy
+
+        gains = numpy.array([self.gain(edges) for (_,edges) in loops]).reshape(len(loops), self.edges.shape[1])
+        result = decomposition.with_gains(gains)
+        result.components = [VectorizedLoops(c, gains[indices]) for (c,indices) in zip(decomposition.components, decomposition.loop_indices)]
+        return result
+
+
+    def result(self, gain):
+        """ Reshape a calculated gain to the broadcast shape of the weights; a scalar for scalar weights. """
+        import numpy
+
+        return numpy.broadcast_to(gain, self.edges.shape[1:]).reshape(self.shape)[()]
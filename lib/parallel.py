@@ -0,0 +1,114 @@
+""" Parallel analysis of a SFG in a pool of worker processes.
+
+The analysis is pure Python and CPU-bound, so threads do not help; instead, each worker process receives a
+    picklable snapshot of the compact graph once, when it starts. The work is then distributed in independent
+    chunks: the loop search by start node, the forward path search by (source, sink) pair, and the cofactors
+    by the first loop of the non-touching loop sets. The results are always collected in the order of the
+    chunks, so they do not depend on the scheduling.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from .compact import CompactGraph
+from .mason import MasonDecomposition
+
+
+_graph: "CompactGraph|None" = None
+
+
+def _initialize(graph: CompactGraph):
+    """ Internal function to store the graph snapshot in a worker process. """
+    global _graph
+    _graph = graph
+
+
+def _find_cycles(include_zero_gain: bool, component: list[int], starts: list[int]) -> list:
+    """ Internal function to search loops in a worker process. """
+    return list(_graph.iter_cycles(include_zero_gain, component, starts))
+
+
+def _find_paths(pairs: "list[tuple[int,int]]") -> list:
+    """ Internal function to search forward paths in a worker process; returns a list of (mask, gain) tuples per pair. """
+    return [[(_graph.node_mask(node_ids), _graph.gain(edges)) for (node_ids,edges) in _graph.iter_paths(from_id, to_id)] for (from_id,to_id) in pairs]
+
+
+def _partial_cofactors(non_touching, masks: list[int], first_loops: list[int]) -> list:
+    """ Internal function to calculate partial cofactors in a worker process. """
+    return [non_touching.partial_cofactor(mask, first_loops) for mask in masks]
+
+
+def _split(items: list, count: int) -> list[list]:
+    """ Internal function to split a list round-robin into up to `count` non-empty chunks. """
+    return [chunk for chunk in (items[i::count] for i in range(count)) if chunk]
+
+
+class WorkerPool:
+    """ A pool of worker processes, which all hold a snapshot of the same compact graph. """
+
+    def __init__(self, graph: CompactGraph, workers: int):
+        """
+        Args:
+            graph:   the graph to analyze.
+            workers: number of worker processes.
+        """
+        self.graph = graph
+        self.workers = workers
+        self._executor = ProcessPoolExecutor(workers, initializer=_initialize, initargs=(graph,))
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+    def close(self):
+        """ Shut down the worker processes. """
+        self._executor.shutdown()
+
+
+    def find_cycles(self, include_zero_gain: bool = False, component: "list[int]|None" = None) -> list[tuple[list[int],tuple[int,...]]]:
+        """
+        Find all loops, by distributing the start nodes of the search to the workers; see CompactGraph.iter_cycles().
+
+        Args:
+            include_zero_gain: if True, loops with zero gain are also included.
+            component:         if given, only loops within these node IDs are searched.
+        """
+        components = self.graph.components(include_zero_gain) if component is None else [component]
+        # round-robin, because the lowest start nodes tend to have the most loops
+        futures = [self._executor.submit(_find_cycles, include_zero_gain, c, starts) for c in components for starts in _split(sorted(c), self.workers)]
+        return [loop for future in futures for loop in future.result()]
+
+
+    def find_paths(self, pairs: "list[tuple[int,int]]") -> list[list]:
+        """ Find the forward paths between each pair of node IDs, as lists of (node mask, path gain) tuples. """
+        size = max(1, -(-len(pairs) // self.workers))
+        futures = [self._executor.submit(_find_paths, pairs[i:i+size]) for i in range(0, len(pairs), size)]
+        return [paths for future in futures for paths in future.result()]
+
+
+    def calculate_cofactors(self, decomposition: MasonDecomposition, keys: "list[tuple[int,int]]"):
+        """
+        Calculate cofactors, by splitting the non-touching loop sets of each component by their first loop,
+            and store them in the decomposition.
+
+        Args:
+            decomposition: the decomposition to calculate the cofactors for.
+            keys:          (component index, excluded mask) tuples; see MasonDecomposition.missing_cofactors().
+        """
+        masks = {}
+        for (c,mask) in keys:
+            masks.setdefault(c, []).append(mask)
+        tasks = []
+        for c,component_masks in masks.items():
+            non_touching = decomposition.components[c]
+            for first_loops in _split(list(range(len(non_touching.masks))), self.workers):
+                tasks.append((c, self._executor.submit(_partial_cofactors, non_touching, component_masks, first_loops)))
+        sums = {key: 1 for key in keys}
+        for (c,future) in tasks:
+            for mask,partial in zip(masks[c], future.result()):
+                sums[(c,mask)] = sums[(c,mask)] + partial
+        for key,cofactor in sums.items():
+            decomposition.store_cofactor(key, cofactor)
@@ -0,0 +1,204 @@
+""" Sparse polynomials in the symbols of the edge weights, to calculate symbolic gains in a compact form.
+
+Mason's gain formula only adds and multiplies the weights, except for the final division. If the weights are
+    sparse polynomials, i.e. dicts of monomial to coefficient, like terms are collected (and cancel) while the
+    determinant and the cofactors are accumulated, so the result stays as small as possible. With sympy
+    expressions instead, the unsimplified expression tree grows with every loop set, and simplifying it
+    afterwards is very slow.
+
+Requires the sympy package.
+"""
+
+from .compact import CompactGraph
+from .mason import MasonDecomposition, product
+
+
+def _multiply_monomials(a: tuple, b: tuple) -> tuple:
+    """ Internal function to multiply two monomials, given as ascending tuples of (atom ID, exponent) tuples. """
+    if not a:
+        return b
+    if not b:
+        return a
+    exponents = dict(a)
+    for (atom,exponent) in b:
+        exponent += exponents.get(atom, 0)
+        if exponent:
+            exponents[atom] = exponent
+        else:
+            del exponents[atom]
+    return tuple(sorted(exponents.items()))
+
+
+class Polynomial:
+    """
+    A sparse (Laurent) polynomial, as a dict of monomial to numeric coefficient. Each monomial is an ascending
+        tuple of (atom ID, exponent) tuples, where the atom IDs refer to PolynomialWeights.atoms; the constant
+        term has the monomial ().
+
+    Polynomials support + - * with each other and with numbers, so they can be used as weights in the
+        mason module. `+=` adds in place.
+    """
+
+    __slots__ = ('terms',)
+
+    def __init__(self, terms: "dict|None" = None):
+        self.terms = {} if terms is None else terms
+
+
+    def __add__(self, other) -> "Polynomial":
+        result = Polynomial(dict(self.terms))
+        result += other
+        return result
+
+    __radd__ = __add__
+
+
+    def __iadd__(self, other) -> "Polynomial":
+        terms = self.terms
+        for (monomial,coefficient) in (other.terms.items() if isinstance(other, Polynomial) else [((), other)]):
+            coefficient = terms.get(monomial, 0) + coefficient
+            if coefficient == 0:
+                terms.pop(monomial, None)
+            else:
+                terms[monomial] = coefficient
+        return self
+
+
+    def __neg__(self) -> "Polynomial":
+        return Polynomial({monomial: -coefficient for (monomial,coefficient) in self.terms.items()})
+
+
+    def __sub__(self, other) -> "Polynomial":
+        return self + (-other)
+
+
+    def __rsub__(self, other) -> "Polynomial":
+        return (-self) + other
+
+
+    def __mul__(self, other) -> "Polynomial":
+        if not isinstance(other, Polynomial):
+            if other == 0:
+                return Polynomial()
+            return Polynomial({monomial: coefficient*other for (monomial,coefficient) in self.terms.items()})
+        terms = {}
+        for (m1,c1) in self.terms.items():
+            for (m2,c2) in other.terms.items():
+                monomial = _multiply_monomials(m1, m2)
+                terms[monomial] = terms.get(monomial, 0) + c1*c2
+        return Polynomial({monomial: coefficient for (monomial,coefficient) in terms.items() if coefficient != 0})
+
+    __rmul__ = __mul__
+
+
+    def content(self) -> tuple:
+        """ Get the monomial with the lowest exponent of each atom over all terms, which divides all terms. """
+        terms = iter(self.terms)
+        exponents = dict(next(terms, ()))
+        for monomial in terms:
+            present = dict(monomial)
+            for atom in set(exponents) | set(present):
+                exponents[atom] = min(exponents.get(atom, 0), present.get(atom, 0))
+        return tuple(sorted((atom,exponent) for (atom,exponent) in exponents.items() if exponent))
+
+
+    def divide_monomial(self, monomial: tuple) -> "Polynomial":
+        """ Divide all terms by a monomial. """
+        inverse = tuple((atom,-exponent) for (atom,exponent) in monomial)
+        return Polynomial({_multiply_monomials(m, inverse): coefficient for (m,coefficient) in self.terms.items()})
+
+
+class PolynomialWeights:
+    """
+    The edge weights of a compact graph, converted to sparse polynomials.
+
+    Each weight is expanded, and every factor of its terms that is not a number becomes an atom; integer
+        powers of an atom are represented by exponents, so e.g. `k/s` has the atoms `k` and `s`.
+    """
+
+    def __init__(self, graph: CompactGraph):
+        """
+        Args:
+            graph: the graph whose weights are converted; weights must be numbers or sympy expressions.
+        """
+        import sympy
+
+        self._sympy = sympy
+        self.atoms = []
+        self.atom_ids = {}
+        self.edges = [self.convert(weight) for weight in graph.weights]
+
+
+    def convert(self, weight) -> Polynomial:
+        """ Convert a number or a sympy expression to a polynomial. """
+        sympy = self._sympy
+        if isinstance(weight, (int, float, complex)):
+            return Polynomial({(): weight} if weight != 0 else {})
+        try:
+            expression = sympy.sympify(weight, strict=True)
+        except sympy.SympifyError:
+            raise ValueError(f'Weight {weight} is neither a number nor a sympy expression; the polynomial method requires sympy weights')
+        result = Polynomial()
+        for term in sympy.Add.make_args(sympy.expand(expression)):
+            coefficient, exponents = sympy.S.One, {}
+            for factor in sympy.Mul.make_args(term):
+                if factor.is_number:
+                    coefficient *= factor
+                    continue
+                base, exponent = factor.as_base_exp()
+                if not exponent.is_Integer:
+                    base, exponent = factor, 1
+                atom = self.atom_ids.setdefault(base, len(self.atoms))
+                if atom == len(self.atoms):
+                    self.atoms.append(base)
+                exponents[atom] = exponents.get(atom, 0) + int(exponent)
+            monomial = tuple(sorted((atom,exponent) for (atom,exponent) in exponents.items() if exponent))
+            if coefficient.is_Integer:
+                coefficient = int(coefficient)
+            elif coefficient.is_Float:
+                coefficient = float(coefficient)
+            result += Polynomial({monomial: coefficient})
+        return result
+
+
+    def gain(self, edges) -> Polynomial:
+        """ Get the product of the weights of the given edge IDs. """
+        return product(self.edges[e] for e in edges)
+
+
+    def expression(self, polynomial: "Polynomial|tuple"):
+        """ Convert a polynomial, or a single monomial, to a sympy expression. """
+        sympy = self._sympy
+        if isinstance(polynomial, tuple):
+            return sympy.Mul(*[self.atoms[atom]**exponent for (atom,exponent) in polynomial])
+        return sympy.Add(*[coefficient * self.expression(monomial) for (monomial,coefficient) in polynomial.terms.items()])
+
+
+    def rational_function(self, decomposition: MasonDecomposition, paths: list):
+        """
+        Calculate the gain Σ(Pₖ·Δₖ)/Δ as a sympy expression, with the numerator as an expanded polynomial, and
+            the determinant as a product of one polynomial per strongly connected component. Common monomial
+            factors are pulled out in front, so numerator and denominator are true polynomials.
+
+        Args:
+            decomposition: the Mason decomposition, with Polynomial loop gains.
+            paths:         see MasonDecomposition.gain(), with Polynomial path gains.
+        """
+        sympy = self._sympy
+        relevant = decomposition.relevant_components(paths)
+        numerator = Polynomial()
+        for (mask,path_gain) in paths:
+            numerator += path_gain * decomposition.cofactor(mask, relevant)
+        if not numerator.terms:
+            return sympy.S.Zero
+
+        content = {}
+        factors = []
+        for (polynomial,power) in [(numerator, 1)] + [(decomposition.cofactor(0, [c]), -1) for c in relevant]:
+            monomial = polynomial.content()
+            for (atom,exponent) in monomial:
+                content[atom] = content.get(atom, 0) + power*exponent
+            polynomial = polynomial.divide_monomial(monomial)
+            if polynomial.terms != {(): 1}:
+                factors.append(sympy.Pow(self.expression(polynomial), power))
+        return sympy.Mul(self.expression(tuple(sorted((atom,exponent) for (atom,exponent) in content.items() if exponent))), *factors)
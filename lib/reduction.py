@@ -0,0 +1,109 @@
+""" Reduction of a SFG with the standard reduction rules, before it is analyzed for a set of (source, sink) pairs.
+
+The rules are applied until none applies anymore:
+- Nodes that are not on any path from a source to its sinks are removed, since they cannot change the gains.
+- Parallel edges are merged into one edge with the sum of their weights.
+- Series edges through a node with a single incoming and a single outgoing edge are merged into one edge with
+    the product of their weights, and the node is removed.
+- A self-loop with the gain L is absorbed by dividing the outgoing edges of its node by (1 - L), or the incoming
+    edges if the node is a sink.
+
+All rules keep the gains between the sources and sinks exactly, so the reduced graph can be analyzed instead of
+    the original one. Sources and sinks are never removed.
+"""
+
+from .compact import is_zero
+
+
+def _reachable(edges: dict, starts) -> set:
+    """ Internal function to get all nodes that can be reached from the start nodes, including them. """
+    result = set(starts)
+    queue = list(result)
+    for v in queue:
+        for w in edges.get(v, ()):
+            if w not in result:
+                result.add(w)
+                queue.append(w)
+    return result
+
+
+def reduce_graph(graph: dict, pairs: "list[tuple]") -> dict:
+    """
+    Reduce a graph for the calculation of the gains between the given pairs of nodes.
+
+    Args:
+        graph: dict of source node to a list of (destination node, weight) tuples, as in SFG.graph.
+        pairs: list of (source, sink) tuples of node names.
+
+    Returns:
+        The reduced graph, in the same format.
+    """
+    successors, predecessors = {}, {}
+    for source,destinations in graph.items():
+        for (destination,weight) in destinations:
+            if not is_zero(weight):
+                _add_edge(successors, predecessors, source, destination, weight)
+
+    relevant = set()
+    sinks_of = {}
+    for (source,sink) in pairs:
+        sinks_of.setdefault(source, set()).add(sink)
+    for source,sinks in sinks_of.items():
+        relevant |= _reachable(successors, [source]) & _reachable(predecessors, sinks)
+    for node in list(successors.keys() | predecessors.keys()):
+        if node not in relevant:
+            _remove_node(successors, predecessors, node)
+
+    sources = {source for (source,_) in pairs}
+    sinks = {sink for (_,sink) in pairs}
+    queue = list(relevant)
+    while queue:
+        v = queue.pop()
+        outgoing, incoming = successors.get(v, {}), predecessors.get(v, {})
+        if v in outgoing and not (v in sources and v in sinks):
+            # x = (inputs) + L·x  <=>  x = (inputs) / (1 - L)
+            factor = 1 / (1 - outgoing[v])
+            _remove_edge(successors, predecessors, v, v)
+            if v in sinks:
+                for u in list(incoming):
+                    _set_edge(successors, predecessors, u, v, incoming[u] * factor)
+            else:
+                for w in list(outgoing):
+                    _set_edge(successors, predecessors, v, w, outgoing[w] * factor)
+            queue.append(v)
+        elif v not in sources and v not in sinks and len(incoming) == 1 and len(outgoing) == 1:
+            ((u,a),) = incoming.items()
+            ((w,b),) = outgoing.items()
+            _remove_node(successors, predecessors, v)
+            _add_edge(successors, predecessors, u, w, a * b)
+            queue += [u, w]
+    return {source: list(destinations.items()) for source,destinations in successors.items() if destinations}
+
+
+def _add_edge(successors: dict, predecessors: dict, source, destination, weight):
+    """ Internal function to add an edge, merging it with a parallel edge. """
+    existing = successors.get(source, {}).get(destination)
+    _set_edge(successors, predecessors, source, destination, weight if existing is None else existing + weight)
+
+
+def _set_edge(successors: dict, predecessors: dict, source, destination, weight):
+    """ Internal function to set the weight of an edge; edges with zero weight are removed. """
+    if is_zero(weight):
+        _remove_edge(successors, predecessors, source, destination)
+        return
+    successors.setdefault(source, {})[destination] = weight
+    predecessors.setdefault(destination, {})[source] = weight
+
+
+def _remove_edge(successors: dict, predecessors: dict, source, destination):
+    """ Internal function to remove an edge, if it exists. """
+    successors.get(source, {}).pop(destination, None)
+    predecessors.get(destination, {}).pop(source, None)
+
+
+def _remove_node(successors: dict, predecessors: dict, node):
+    """ Internal function to remove a node with all its edges. """
+    for w in successors.pop(node, {}):
+        predecessors.get(w, {}).pop(node, None)
+    for u in predecessors.pop(node, {}):
+        successors.get(u, {}).pop(node, None)
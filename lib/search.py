@@ -0,0 +1,308 @@
+""" Graph search algorithms that operate on integer node IDs.
+
+All functions in this module take the graph as an adjacency list, i.e. a sequence where entry `i`
+    is a sequence of the successor IDs of node `i`. Node IDs must be integers from 0 to len(adjacency)-1.
+    The algorithms are implemented iteratively, so they are not limited by Python's recursion limit.
+"""
+
+from typing import Iterator, Sequence
+import time
+from .monitor import AnalysisMonitor
+
+
+def strongly_connected_components(adjacency: Sequence[Sequence[int]], nodes: "Sequence[int]|None" = None) -> list[list[int]]:
+    """
+    Find the strongly connected components of a graph, using an iterative version of Tarjan's algorithm.
+
+    Args:
+        adjacency: successor IDs for each node ID.
+        nodes:     if given, only the sub-graph induced by these node IDs is considered.
+
+    Returns:
+        A list of components, each of them a list of node IDs. Components are returned in reverse
+            topological order, i.e. a component comes before all components it can be reached from.
+    """
+    n = len(adjacency)
+    if nodes is None:
+        nodes = range(n)
+        member = None
+    else:
+        member = [False] * n
+        for v in nodes:
+            member[v] = True
+
+    index = [-1] * n
+    lowlink = [0] * n
+    on_stack = [False] * n
+    stack = []
+    components = []
+    counter = 0
+
+    for root in nodes:
+        if index[root] >= 0:
+            continue
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [(root, 0)]
+        while work:
+            v, i = work[-1]
+            successors = adjacency[v]
+            if i < len(successors):
+                work[-1] = (v, i+1)
+                w = successors[i]
+                if member is not None and not member[w]:
+                    continue
+                if index[w] < 0:
+                    index[w] = lowlink[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack[w] = True
+                    work.append((w, 0))
+                elif on_stack[w] and index[w] < lowlink[v]:
+                    lowlink[v] = index[w]
+                continue
+            work.pop()
+            if work:
+                u = work[-1][0]
+                if lowlink[v] < lowlink[u]:
+                    lowlink[u] = lowlink[v]
+            if lowlink[v] == index[v]:
+                component = []
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = False
+                    component.append(w)
+                    if w == v:
+                        break
+                components.append(component)
+    return components
+
+
+def simple_cycles(adjacency: Sequence[Sequence[int]], nodes: "Sequence[int]|None" = None, monitor: "AnalysisMonitor|None" = None) -> Iterator[list[int]]:
+    """
+    Enumerate all elementary cycles of a graph, using an iterative version of Johnson's algorithm.
+
+    Args:
+        adjacency: successor IDs for each node ID; duplicate successors (parallel edges) are ignored.
+        nodes:     if given, only the sub-graph induced by these node IDs is considered.
+        monitor:   if given, the search steps are counted, and cancellation is checked regularly.
+
+    Returns:
+        A generator that yields each elementary cycle exactly once, as a list of node IDs. Every cycle
+            starts with its lowest node ID, and the edge from the last to the first node closes the cycle.
+    """
+    search = _JohnsonSearch(adjacency, nodes, monitor)
+    yield from search.self_loops(search.nodes)
+
+    pending = [c for c in strongly_connected_components(search.successors, search.nodes) if len(c) > 1]
+    while pending:
+        component = pending.pop()
+        start = min(component)
+        yield from search.circuits(component, start)
+
+        # all cycles through the start node are found; continue with the remaining sub-graph
+        remaining = [v for v in component if v != start]
+        pending.extend(c for c in strongly_connected_components(search.successors, remaining) if len(c) > 1)
+
+
+def cycles_from(adjacency: Sequence[Sequence[int]], start: int, nodes: "Sequence[int]|None" = None, monitor: "AnalysisMonitor|None" = None) -> Iterator[list[int]]:
+    """
+    Enumerate the elementary cycles whose lowest node ID is the given start node. Calling this for every
+        node yields the same cycles as simple_cycles(), but the calls are independent of each other, so
+        they can be distributed e.g. to multiple processes.
+
+    Args:
+        adjacency: successor IDs for each node ID; duplicate successors (parallel edges) are ignored.
+        start:     the start node ID.
+        nodes:     if given, only the sub-graph induced by these node IDs is considered.
+        monitor:   see simple_cycles().
+
+    Returns:
+        A generator that yields each cycle exactly once, as a list of node IDs starting with the start node.
+    """
+    nodes = [v for v in (range(len(adjacency)) if nodes is None else nodes) if v >= start]
+    search = _JohnsonSearch(adjacency, nodes, monitor)
+    yield from search.self_loops([start])
+    for component in strongly_connected_components(search.successors, nodes):
+        if start in component:
+            if len(component) > 1:
+                yield from search.circuits(component, start)
+            break
+
+
+class _JohnsonSearch:
+    """ Internal state of Johnson's algorithm. """
+
+    def __init__(self, adjacency: Sequence[Sequence[int]], nodes: "Sequence[int]|None", monitor: "AnalysisMonitor|None" = None):
+        n = len(adjacency)
+        self.monitor = monitor
+        self.nodes = range(n) if nodes is None else nodes
+        # de-duplicate successors, but keep their order, so that the result is deterministic
+        self.successors = [()] * n
+        for v in self.nodes:
+            self.successors[v] = list(dict.fromkeys(adjacency[v]))
+        self.blocked = [False] * n
+        self.blocked_by = [set() for _ in range(n)]
+        self.member = [False] * n
+
+
+    def self_loops(self, nodes: Sequence[int]) -> Iterator[list[int]]:
+        """ Yield the self-loops of the given nodes, and remove them, so that circuits() does not have to care. """
+        for v in nodes:
+            if v in self.successors[v]:
+                yield [v]
+                self.successors[v].remove(v)
+
+
+    def circuits(self, component: list[int], start: int) -> Iterator[list[int]]:
+        """ Yield all cycles through the start node within a strongly connected component. """
+        successors, blocked, blocked_by, member = self.successors, self.blocked, self.blocked_by, self.member
+        for v in component:
+            member[v] = True
+            blocked[v] = False
+            blocked_by[v].clear()
+
+        path = [start]
+        closed = [False]
+        blocked[start] = True
+        work = [(start, 0)]
+        monitor = self.monitor
+        steps = 0
+        while work:
+            steps += 1
+            if steps == AnalysisMonitor.CHECK_INTERVAL:
+                _report(monitor, 'loop search steps', steps, len(path))
+                steps = 0
+            v, i = work[-1]
+            succ = successors[v]
+            if i < len(succ):
+                work[-1] = (v, i+1)
+                w = succ[i]
+                if not member[w]:
+                    continue
+                if w == start:
+                    if monitor is not None:
+                        monitor.peak('search depth', len(path))
+                    yield path[:]
+                    closed[-1] = True
+                elif not blocked[w]:
+                    path.append(w)
+                    closed.append(False)
+                    blocked[w] = True
+                    work.append((w, 0))
+                continue
+
+            # all successors of v are explored
+            work.pop()
+            path.pop()
+            found = closed.pop()
+            if found:
+                unblock = [v]
+                while unblock:
+                    u = unblock.pop()
+                    if blocked[u]:
+                        blocked[u] = False
+                        unblock.extend(blocked_by[u])
+                        blocked_by[u].clear()
+            else:
+                for w in succ:
+                    if member[w]:
+                        blocked_by[w].add(v)
+            if closed:
+                closed[-1] = closed[-1] or found
+
+        _report(monitor, 'loop search steps', steps, 0)
+        for v in component:
+            member[v] = False
+
+
+def simple_paths(adjacency: Sequence[Sequence[int]], source: int, target: int, reachable: "Sequence[bool]|None" = None,
+        max_length: "int|None" = None, deadline: "float|None" = None, monitor: "AnalysisMonitor|None" = None) -> Iterator[list[int]]:
+    """
+    Enumerate all simple paths between two nodes, using an iterative depth-first search that keeps the
+        current path in a single stack.
+
+    Args:
+        adjacency:  successor IDs for each node ID; the successors of each node must be distinct.
+        source:     node ID where the paths start.
+        target:     node ID where the paths end.
+        reachable:  if given, for each node ID whether the target can be reached from it (see reaching());
+            the search never enters nodes from which the target cannot be reached.
+        max_length: if given, only paths with at most this number of edges are enumerated.
+        deadline:   if given, a time.monotonic() timestamp; when it is exceeded, TimeoutError is raised.
+        monitor:    if given, the search steps are counted, and cancellation is checked regularly.
+
+    Returns:
+        A generator that yields each path once, as a list of node IDs from source to target.
+    """
+    if source == target:
+        yield [source]
+        return
+    if max_length is None:
+        max_length = len(adjacency)
+    on_path = [False] * len(adjacency)
+    on_path[source] = True
+    path = [source]
+    work = [(source, 0)]
+    steps = 0
+    while work:
+        steps += 1
+        if steps == AnalysisMonitor.CHECK_INTERVAL:
+            _report(monitor, 'path search steps', steps, len(path))
+            steps = 0
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError('Path search timed out')
+        v, i = work[-1]
+        successors = adjacency[v]
+        if i < len(successors):
+            work[-1] = (v, i+1)
+            w = successors[i]
+            if on_path[w]:
+                continue
+            if w == target:
+                if len(path) <= max_length:
+                    if monitor is not None:
+                        monitor.peak('search depth', len(path) + 1)
+                    yield path + [w]
+                continue
+            if len(path) >= max_length or (reachable is not None and not reachable[w]):
+                continue
+            on_path[w] = True
+            path.append(w)
+            work.append((w, 0))
+            continue
+        work.pop()
+        on_path[path.pop()] = False
+    _report(monitor, 'path search steps', steps, 0)
+
+
+def reaching(predecessors: Sequence[Sequence[int]], target: int) -> list[bool]:
+    """
+    Find all nodes from which a target node can be reached, by a breadth-first search backwards from the target.
+
+    Args:
+        predecessors: predecessor IDs for each node ID, i.e. the adjacency list of the reversed graph.
+        target:       the target node ID.
+
+    Returns:
+        For each node ID, whether the target can be reached from it.
+    """
+    result = [False] * len(predecessors)
+    result[target] = True
+    queue = [target]
+    for v in queue:
+        for u in predecessors[v]:
+            if not result[u]:
+                result[u] = True
+                queue.append(u)
+    return result
+
+
+def _report(monitor: "AnalysisMonitor|None", name: str, steps: int, depth: int):
+    """ Internal function to report the steps and the current depth of a search to a monitor, and check for cancellation. """
+    if monitor is not None:
+        monitor.count(name, steps)
+        monitor.peak('search depth', depth)
+        monitor.check()
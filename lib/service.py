@@ -0,0 +1,155 @@
+""" Asyncio front end for the gain calculation, e.g. for a web service.
+
+The analysis is CPU-bound and blocking, so it runs in a thread pool, and the event loop stays responsive.
+    Concurrent identical requests (same SFG in the same state, same pairs and method) are coalesced onto a
+    single calculation, and all calculations share the analysis cache of their SFG (see AnalysisCache), so
+    the loops, the determinant and the cofactors are only calculated once per graph.
+"""
+
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import TYPE_CHECKING
+import asyncio
+import threading
+import weakref
+from .monitor import AnalysisMonitor
+
+if TYPE_CHECKING:
+    from .sfg import SFG
+
+
+class _Calculation:
+    """ A running calculation, and the number of requests that wait for it. """
+
+    def __init__(self, future: asyncio.Future, monitor: AnalysisMonitor):
+        self.future = future
+        self.monitor = monitor
+        self.waiters = 0
+
+
+class SFGService:
+    """
+    Calculates gains of SFGs without blocking the event loop.
+
+    Each SFG is only analyzed by one thread at a time, since the analysis caches its results in the SFG; do not
+        edit a SFG while a calculation for it is running. If all requests that wait for a calculation are
+        cancelled, the calculation is cancelled as well (see AnalysisMonitor).
+
+    Example:
+
+        service = SFGService()
+        gain = await service.calculate_gain(sfg, 'In', 'Out')
+    """
+
+    def __init__(self, executor: "Executor|None" = None, threads: int = 4):
+        """
+        Args:
+            executor: the executor that runs the calculations; it must run them in threads of this process, so
+                that the SFGs and their caches are shared. If None, a thread pool is created, which is shut
+                down by close().
+            threads:  number of threads of the thread pool, if no executor is given.
+        """
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix='SFGService') if executor is None else executor
+        self._own_executor = executor is None
+        self._calculations = {}
+        self._locks = weakref.WeakKeyDictionary()
+        self._locks_lock = threading.Lock()
+        self.calculations = 0
+        """ Number of calculations that were started. """
+        self.coalesced = 0
+        """ Number of requests that were served by a calculation that was already running. """
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, *args):
+        self.close()
+
+
+    def close(self):
+        """ Shut down the thread pool, if it was created by this service. """
+        if self._own_executor:
+            self.executor.shutdown(wait=False)
+
+
+    async def calculate_gain(self, sfg: "SFG", from_node, to_node, method: str = 'mason', workers: "int|None" = None):
+        """
+        Calculate the gain from one node to another node; see SFG.calculate_gain().
+
+        Args:
+            sfg:       the SFG.
+            from_node: node name where the path starts.
+            to_node:   node name where the path ends.
+            method:    see SFG.calculate_gain().
+            workers:   see SFG.calculate_gain(); the worker processes are started by the calculation thread.
+        """
+        return (await self.calculate_gains(sfg, [(from_node, to_node)], method, workers))[0]
+
+
+    async def calculate_gains(self, sfg: "SFG", pairs: "list[tuple]", method: str = 'mason', workers: "int|None" = None) -> list:
+        """
+        Calculate the gains between multiple pairs of nodes; see SFG.calculate_gains().
+
+        Args:
+            sfg:     the SFG.
+            pairs:   list of (from_node, to_node) tuples.
+            method:  see SFG.calculate_gain().
+            workers: see calculate_gain().
+        """
+        pairs = [tuple(tuple(name) if isinstance(name, list) else name for name in pair) for pair in pairs]
+        sfg._analysis.check_edits()
+        key = (id(sfg), sfg._analysis.weights_version, tuple(pairs), method, workers)
+        calculation = self._calculations.get(key)
+        if calculation is None or calculation.monitor.cancelled:
+            monitor = AnalysisMonitor()
+            future = asyncio.get_running_loop().run_in_executor(self.executor, self._calculate, sfg, pairs, method, workers, monitor)
+            calculation = self._calculations[key] = _Calculation(future, monitor)
+            future.add_done_callback(lambda _: self._finished(key, calculation))
+            self.calculations += 1
+        else:
+            self.coalesced += 1
+
+        calculation.waiters += 1
+        try:
+            # shielded, so that a cancelled request does not cancel the calculation for the others
+            return list(await asyncio.shield(calculation.future))
+        finally:
+            calculation.waiters -= 1
+            if calculation.waiters == 0 and not calculation.future.done():
+                # forget it first, so that a later identical request starts a new calculation instead of joining this one
+                if self._calculations.get(key) is calculation:
+                    del self._calculations[key]
+                calculation.monitor.cancel()
+
+
+    async def gain_matrix(self, sfg: "SFG", sources: list, sinks: list, method: str = 'mason', workers: "int|None" = None) -> list[list]:
+        """
+        Calculate the gains from each of the source nodes to each of the sink nodes; see SFG.gain_matrix().
+
+        Args:
+            sfg:     the SFG.
+            sources: list of node names where the paths start.
+            sinks:   list of node names where the paths end.
+            method:  see SFG.calculate_gain().
+            workers: see calculate_gain().
+        """
+        gains = await self.calculate_gains(sfg, [(source,sink) for source in sources for sink in sinks], method, workers)
+        return [gains[i*len(sinks):(i+1)*len(sinks)] for i in range(len(sources))]
+
+
+    def _calculate(self, sfg: "SFG", pairs: list, method: str, workers: "int|None", monitor: AnalysisMonitor) -> list:
+        """ Internal method that runs a calculation in a thread of the executor. """
+        with self._locks_lock:
+            lock = self._locks.setdefault(sfg, threading.Lock())
+        with lock:
+            return sfg.calculate_gains(pairs, method, workers, monitor)
+
+
+    def _finished(self, key: tuple, calculation: _Calculation):
+        """ Internal method to forget a finished calculation, so that later requests calculate (or hit the cache) again. """
+        if self._calculations.get(key) is calculation:
+            del self._calculations[key]
+        if not calculation.future.cancelled():
+            # mark the exception as retrieved, in case all requests were cancelled
+            calculation.future.exception()
@@ -1,9 +1,25 @@
-from typing import TypeVar, Union
-import itertools
-from graphviz import Digraph
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, TypeVar, Union
 from types import SimpleNamespace
+import time
 from dataclasses import dataclass
 from collections import defaultdict
+from .cache import AnalysisCache
+from .compact import CompactGraph, is_zero
+from .dot import body_lines, write_dot
+from .netlist import read_netlist
+from .storage import load_graph, save_graph
+from .incremental import EditCountingGraph, IncrementalAnalysis
+from .monitor import AnalysisMonitor, measure
+from .numeric import NumericWeights
+from .reduction import reduce_graph
+from .linear import LinearSolver
+from .sweep import compile_expression, compile_gradients, sweep_gains
+
+if TYPE_CHECKING:
+    # only imported on first use, so that the analysis starts fast and does not need them
+    from graphviz import Digraph
+    from .parallel import WorkerPool
+    from .service import SFGService
 
 
 class SFG:
@@ -55,20 +71,205 @@ class SFG:
         weights: list
 
 
-    def __init__(self, group_name_sep: "str|None" = None):
+    default_cache = AnalysisCache()
+    """ Cache for the analysis results of all SFGs that are not given their own cache. Its size can be changed
+     with `SFG.default_cache.resize(n)`, and `resize(0)` disables it. """
+
+    _default_service: "SFGService|None" = None
+
+
+    def __init__(self, group_name_sep: "str|None" = None, cache: "AnalysisCache|None" = None):
         """
         Args:
             group_name_sep: any node names provided as string will be split at this separator into (group,node).
                 If you do not want to  get automatic splitting, leave it as None.
+            cache:          LRU cache for the loops, loop and path gains, and cofactors, keyed by a fingerprint
+                of the graph. By default, SFG.default_cache is used, which is shared by all SFGs, so analyzing
+                an identical graph again (e.g. when a notebook cell is re-run) reuses the previous results.
         """
         def lf():
             return []
         self._list_factory = lf
-        self.graph: dict[str,list]
-        self.graph = defaultdict(self._list_factory)
+        self._graph = EditCountingGraph()
         self.group_name_separator = group_name_sep
         self.graph_attrs = SFG.GraphAttrPresets.SfgDefault
-    
+        self._analysis = IncrementalAnalysis(self._graph, SFG.default_cache if cache is None else cache)
+        self._blocks = {}
+
+
+    @property
+    def graph(self) -> dict[tuple[str,str],list]:
+        """
+        The graph, as dict of source node name to a list of (destination node name, weight) tuples. It may be
+            edited or replaced directly; the analysis detects this, but then has to start over, so prefer `add()`,
+            `remove()` and `set_weight()`.
+        """
+        return self._graph
+
+
+    @graph.setter
+    def graph(self, graph: dict):
+        self._graph = graph if isinstance(graph, EditCountingGraph) else EditCountingGraph(graph)
+        self._analysis.replace_graph(self._graph)
+
+
+    @classmethod
+    def from_edges(cls, edges: Iterable[tuple], group_name_sep: "str|None" = None, cache: "AnalysisCache|None" = None) -> "SFG":
+        """
+        Create a SFG from many edges at once; see `add_edges()`.
+
+        Args:
+            edges:          iterable of (from_node, to_node) or (from_node, to_node, weight) tuples.
+            group_name_sep: see `__init__()`.
+            cache:          see `__init__()`.
+        """
+        sfg = cls(group_name_sep, cache)
+        sfg.add_edges(edges)
+        return sfg
+
+
+    @classmethod
+    def from_arrays(cls, sources, destinations, weights = None, names = None, group_name_sep: "str|None" = None,
+            cache: "AnalysisCache|None" = None) -> "SFG":
+        """
+        Create a SFG from arrays of integer node IDs, e.g. from numpy arrays.
+
+        Args:
+            sources:        node ID where each edge starts.
+            destinations:   node ID where each edge ends.
+            weights:        weight of each edge; if None, all weights are 1.
+            names:          node name for each node ID; if None, the names are the IDs as strings.
+            group_name_sep: see `__init__()`.
+            cache:          see `__init__()`.
+
+        Names can be provided the same way as for the `add()` method; each name is only split once.
+        """
+        def to_list(values) -> list:
+            return values.tolist() if hasattr(values, 'tolist') else list(values)
+        sources, destinations = to_list(sources), to_list(destinations)
+        weights = [1] * len(sources) if weights is None else to_list(weights)
+        if not len(sources) == len(destinations) == len(weights):
+            raise ValueError('Expecting the same number of sources, destinations and weights')
+        sfg = cls(group_name_sep, cache)
+        if names is None:
+            nodes = [sfg._split_name(str(i)) for i in range(max(sources + destinations, default=-1) + 1)]
+        else:
+            nodes = [sfg._split_name(name) for name in names]
+        if min(sources + destinations, default=0) < 0 or max(sources + destinations, default=-1) >= len(nodes):
+            raise ValueError(f'Expecting node IDs from 0 to {len(nodes)-1}')
+        graph = defaultdict(list)
+        for (source,destination,weight) in zip(sources, destinations, weights):
+            graph[nodes[source]].append((nodes[destination],weight))
+        sfg.graph.update(graph)
+        sfg._analysis.structure_changed()
+        return sfg
+
+
+    @classmethod
+    def from_sparam_blocks(cls, blocks: dict, connections: Iterable[tuple] = (), group_name_sep: "str|None" = '.',
+            cache: "AnalysisCache|None" = None) -> "SFG":
+        """
+        Create the SFG of a network of N-ports, each given by its S-parameter matrix.
+
+        Port k of a block named X has the incident wave node (X, 'ka') and the reflected wave node (X, 'kb'),
+            numbered from 1, and each entry S[i][j] is the edge from port j+1's incident wave to port i+1's
+            reflected wave. Entries that are zero are left out.
+
+        Args:
+            blocks:         dict of block name to its square S-parameter matrix, as nested lists, or as
+                any matrix with a tolist() method (e.g. a numpy array, or a sympy Matrix).
+            connections:    (port, port) tuples of connected ports, where each port is a tuple (block name,
+                port number), or a string like 'X.2'. The reflected wave of each port becomes the incident
+                wave of the other one. Unconnected ports stay open, so they can be used as sources and sinks,
+                e.g. (X, '1a') and (X, '1b'), or 'X.1a' and 'X.1b' with the default separator.
+            group_name_sep: see `__init__()`.
+            cache:          see `__init__()`.
+        """
+        sfg = cls(group_name_sep, cache)
+        graph = sfg.graph
+        port_counts = {}
+        for name,matrix in blocks.items():
+            rows = matrix.tolist() if hasattr(matrix, 'tolist') else matrix
+            port_counts[name] = len(rows)
+            for i,row in enumerate(rows):
+                if len(row) != len(rows):
+                    raise ValueError(f'Expecting a square S-parameter matrix for block {name}')
+                for j,weight in enumerate(row):
+                    if not is_zero(weight):
+                        graph[(name, f'{j+1}a')].append(((name, f'{i+1}b'),weight))
+        def port(spec) -> tuple[str,int]:
+            name, number = spec.rsplit('.', 1) if isinstance(spec, str) else spec
+            if name not in port_counts or not 1 <= int(number) <= port_counts[name]:
+                raise ValueError(f'Port {spec} does not exist')
+            return name, int(number)
+        for (a,b) in connections:
+            (name_a,port_a), (name_b,port_b) = port(a), port(b)
+            graph[(name_a, f'{port_a}b')].append(((name_b, f'{port_b}a'),1))
+            graph[(name_b, f'{port_b}b')].append(((name_a, f'{port_a}a'),1))
+        sfg._analysis.structure_changed()
+        return sfg
+
+
+    @classmethod
+    def read_netlist(cls, file, group_name_sep: "str|None" = '.', cache: "AnalysisCache|None" = None) -> "tuple[SFG,list[tuple[str,str]]]":
+        """
+        Load a SFG from a text netlist, line by line; see the netlist module for the format, which is the
+            one of `samples/06_parser.py`.
+
+        Args:
+            file:           path of the netlist, or a text file object.
+            group_name_sep: see `__init__()`.
+            cache:          see `__init__()`.
+
+        Returns:
+            A tuple (sfg, pairs), where pairs is a list of the (from_node, to_node) tuples in the netlist.
+        """
+        edges, pairs = read_netlist(file)
+        return cls.from_edges(edges, group_name_sep, cache), pairs
+
+
+    @classmethod
+    def load(cls, path, cache: "AnalysisCache|None" = None) -> "SFG":
+        """
+        Load a SFG that was saved with `save()`, including the analysis results if they were saved.
+
+        The arrays in the file are memory-mapped, so loading is fast, and processes that load the same file
+            share their memory. The file is partly pickled, so only load files from trusted sources.
+
+        Args:
+            path:  path of the file.
+            cache: see `__init__()`.
+        """
+        header, compact, sources, loops, loop_components = load_graph(path)
+        sfg = cls(header['group_name_separator'], cache)
+        sfg.graph_attrs = header['graph_attrs']
+        nodes, targets, weights = compact.nodes, compact.targets, compact.weights
+        for source_id in sources:
+            sfg.graph[nodes[source_id]] = [(nodes[targets[e]],weights[e]) for e in compact.out_edges(source_id)]
+        sfg._analysis.restore(compact, loops, loop_components, header['decomposition'])
+        return sfg
+
+
+    def save(self, path, include_analysis: bool = False):
+        """
+        Save the SFG to a compact binary file; see the storage module. Numeric weights are stored as arrays,
+            and any other weights (e.g. sympy expressions) are pickled.
+
+        Args:
+            path:             path of the file.
+            include_analysis: if True, the loops and the Mason decomposition (the non-touching loop sets, and
+                the determinant and all cofactors calculated so far) are also saved; they are calculated first
+                if necessary. Then the expensive part of the analysis is skipped after `load()`.
+        """
+        graph = self._compact_graph()
+        sources = [graph.node_ids[node] for node in self.graph]
+        header = dict(group_name_separator=self.group_name_separator, graph_attrs=self.graph_attrs)
+        if include_analysis:
+            decomposition = self._analysis.decomposition()
+            save_graph(path, graph, sources, header, self._analysis.loops(), self._analysis.loop_components(), decomposition)
+        else:
+            save_graph(path, graph, sources, header)
+
 
     def add(self, from_node: "tuple[str,str]|str", to_node: "tuple[str,str]|str", weight = 1):
         """
@@ -84,20 +285,204 @@ class SFG:
             group_name_sep parameter to the constructor, the name will automatically be split.
         """
         self.graph[self._split_name(from_node)].append((self._split_name(to_node),weight))
+        self._analysis.structure_changed()
+
+
+    def add_edges(self, edges: Iterable[tuple]):
+        """
+        Add many edges at once, which is much faster than calling `add()` for each edge.
+
+        Args:
+            edges: iterable of (from_node, to_node) or (from_node, to_node, weight) tuples; if there is no
+                weight, it is 1. The iterable is consumed lazily, so it may e.g. be a generator.
+
+        Names can be provided the same way as for the `add()` method; each name is only split once.
+        """
+        separator = self.group_name_separator
+        split_names = {}
+        def split(name):
+            if name.__class__ is not str:
+                return self._split_name(name)
+            result = split_names.get(name)
+            if result is None:
+                # same as _split_name(), but faster
+                group, found, rest = name.partition(separator) if separator is not None else (None, '', name)
+                result = split_names[name] = (group, rest) if found else (None, name)
+            return result
+        # collected in plain lists, and added to the graph once per node
+        added = defaultdict(list)
+        try:
+            for edge in edges:
+                if len(edge) == 3:
+                    from_node, to_node, weight = edge
+                elif len(edge) == 2:
+                    (from_node, to_node), weight = edge, 1
+                else:
+                    raise ValueError(f'Expecting edges as (from_node, to_node) or (from_node, to_node, weight), got {edge}')
+                added[split(from_node)].append((split(to_node),weight))
+        finally:
+            for (source,destinations) in added.items():
+                self.graph[source].extend(destinations)
+            self._analysis.structure_changed()
 
 
-    def plot(self, name: str = 'SFG', show_unity_weights: bool = True) -> Digraph:
+    def remove(self, from_node: "tuple[str,str]|str", to_node: "tuple[str,str]|str"):
+        """
+        Remove all edges from one node to another node from the graph.
+
+        Args:
+            from_node: node name where the edge starts.
+            to_node:   node name where the edge ends.
+
+        Names can be provided the same way as for the `add()` method.
+        """
+        from_node = self._split_name(from_node)
+        to_node = self._split_name(to_node)
+        destinations = self.graph.get(from_node, [])
+        remaining = [(destination,weight) for (destination,weight) in destinations if destination != to_node]
+        if len(remaining) == len(destinations):
+            raise ValueError(f'There is no edge from {from_node} to {to_node}')
+        if remaining:
+            self.graph[from_node] = remaining
+        else:
+            del self.graph[from_node]
+        self._analysis.structure_changed()
+
+
+    def set_weight(self, from_node: "tuple[str,str]|str", to_node: "tuple[str,str]|str", weight):
+        """
+        Change the weight of an existing edge.
+
+        Changing weights is cheaper than removing and adding edges, because the loops of the SFG do not have
+            to be searched again for the next gain calculation.
+
+        Args:
+            from_node: node name where the edge starts.
+            to_node:   node name where the edge ends.
+            weight:    new weight of the edge; see `add()`.
+
+        Names can be provided the same way as for the `add()` method.
+        """
+        from_node = self._split_name(from_node)
+        to_node = self._split_name(to_node)
+        indices = [i for i,(destination,_) in enumerate(self.graph.get(from_node, [])) if destination == to_node]
+        if len(indices) < 1:
+            raise ValueError(f'There is no edge from {from_node} to {to_node}')
+        if len(indices) > 1:
+            raise ValueError(f'There are multiple edges from {from_node} to {to_node}')
+        self.graph[from_node][indices[0]] = (to_node,weight)
+        self._analysis.weight_changed(from_node, indices[0])
+
+
+    def add_block(self, name: str, block: "SFG", inputs: list, outputs: list, method: str = 'mason'):
+        """
+        Instantiate another SFG as a block of this SFG, e.g. an amplifier or a filter that is used multiple times.
+
+        The block is reduced to the gains from its input nodes to its output nodes (see `reduce()`), and only
+            these gains are added as edges between its port nodes, so the loops within the block are never
+            searched in this SFG. The port nodes are named `(name, port)`, where `port` is the name of the node
+            in the block without its group, e.g. the input 'X.1a' of block 'A' becomes the node ('A', '1a').
+
+        Connect the blocks with edges into their input nodes, and out of their output nodes; edges into the
+            output nodes of a block would bypass its internal structure. Blocks may contain blocks themselves.
+
+        Args:
+            name:    name of the block instance, which becomes the group of its port nodes.
+            block:   the SFG of the block; it is not copied, so call `update_blocks()` after editing it.
+            inputs:  names of the input nodes of the block (e.g. the incident waves of its ports); they must not
+                be the destination of any edge within the block.
+            outputs: names of the output nodes of the block (e.g. the reflected waves of its ports).
+            method:  see `calculate_gain()`; the method to reduce the block with.
+
+        Names of the nodes of the block can be provided the same way as for its `add()` method.
+        """
+        if name in self._blocks:
+            raise ValueError(f'There already is a block named {name}')
+        ports = [block._split_name(node)[1] for node in list(inputs) + list(outputs)]
+        if len(set(ports)) != len(ports):
+            raise ValueError(f'The port names of block {name} are not unique: {", ".join(str(port) for port in ports)}')
+        # reduce first, so that a block that cannot be reduced is not registered; the result is memoized
+        block.reduce(inputs, outputs, method)
+        self._blocks[name] = (block, list(inputs), list(outputs), method)
+        self._set_block_edges(name, {})
+
+
+    def update_blocks(self):
+        """
+        Update the edges of all blocks (see `add_block()`) after their SFGs were edited; blocks that were not
+            edited are not reduced again.
+        """
+        for name in self._blocks:
+            self._set_block_edges(name, self._block_edges(name))
+
+
+    def reduce(self, inputs: list, outputs: list, method: str = 'mason') -> list[list]:
+        """
+        Reduce the SFG to the gains from its input nodes to its output nodes, e.g. to its S-parameter matrix.
+
+        The result is memoized until the SFG is edited, so reducing an SFG that is used as block multiple times,
+            or in multiple SFGs, only calculates it once.
+
+        Args:
+            inputs:  names of the input nodes, which must not be the destination of any edge.
+            outputs: names of the output nodes.
+            method:  see `calculate_gain()`.
+
+        Names can be provided the same way as for the `add()` method.
+
+        Returns:
+            A nested list, where element [i][j] is the gain from inputs[i] to outputs[j]; see `gain_matrix()`.
+        """
+        inputs = [self._split_name(node) for node in inputs]
+        outputs = [self._split_name(node) for node in outputs]
+        graph = self._compact_graph()
+        for node in inputs + outputs:
+            if node not in graph.node_ids:
+                raise ValueError(f'Node {node} does not exist')
+        for node in inputs:
+            if graph.in_degree[graph.node_ids[node]] > 0:
+                raise ValueError(f'Input node {node} must not be the destination of any edge')
+        def calculate() -> list[list]:
+            # ports that are only connected in one direction (e.g. a matched port) have no path, so their gain is zero
+            pairs = [(source,sink) for source in inputs for sink in outputs
+                if graph.out_edges(graph.node_ids[source]) and graph.in_degree[graph.node_ids[sink]] > 0]
+            gains = dict(zip(pairs, self.calculate_gains(pairs, method) if pairs else []))
+            return [[gains[(source,sink)] if (source,sink) in gains else self._zero_gain(method) for sink in outputs] for source in inputs]
+        return self._analysis.memoize(('reduce', tuple(inputs), tuple(outputs), method), calculate)
+
+
+    def plot(self, name: str = 'SFG', show_unity_weights: bool = True, aggregate_edges: bool = False,
+            collapse_groups: "Iterable[str]|bool|None" = None) -> "Digraph":
         """
         Return a graphviz.Digraph of the SFG.
         
         Args:
             name:               name of the graphviz Digraph; only relevant if you want to export this later.
             show_unity_weights: if False, edge labels for weights of 1 are hidden.
+            aggregate_edges:    if True, parallel edges are drawn as one edge, labelled with the sum of their weights.
+            collapse_groups:    names of groups that are drawn as a single node, or True to collapse all groups;
+                this keeps huge graphs renderable. Edges within a collapsed group are omitted, and the edges
+                between the same pair of nodes outside of it are drawn as one edge, labelled with their number.
+        """
+        return self._plot(self.graph, name, show_unity_weights, aggregate_edges, collapse_groups)
+
+
+    def write_dot(self, file, show_unity_weights: bool = True, aggregate_edges: bool = False,
+            collapse_groups: "Iterable[str]|bool|None" = None):
         """
-        return self._plot(self.graph, name, show_unity_weights)
+        Write the plot of the SFG as graphviz DOT text, like `plot()`, but directly to a file, line by line.
+            This is faster and needs less memory for large graphs.
 
+        Args:
+            file:               path or text stream to write to.
+            show_unity_weights: see `plot()`.
+            aggregate_edges:    see `plot()`.
+            collapse_groups:    see `plot()`.
+        """
+        write_dot(file, self.graph, self.graph_attrs, show_unity_weights=show_unity_weights, aggregate_edges=aggregate_edges, collapse_groups=collapse_groups)
 
-    def plot_loops(self, name_prefix: str = 'SFG', find_kwargs: dict = {}, plot_kwargs: dict = {}) -> list[Digraph]:
+
+    def plot_loops(self, name_prefix: str = 'SFG', find_kwargs: dict = {}, plot_kwargs: dict = {}) -> "list[Digraph]":
         """
         Return a list graphviz.Digraph, one for each closed loop in the SFG.
         
@@ -111,16 +496,16 @@ class SFG:
         result = []
         for i,loop in enumerate(loops):
             graph = defaultdict(self._list_factory)
-            for i in range(len(loop.nodes)):
-                j = (i+1)%len(loop.nodes)
-                sn, dn = loop.nodes[i], loop.nodes[j]
+            for k in range(len(loop.nodes)):
+                j = (k+1)%len(loop.nodes)
+                sn, dn = loop.nodes[k], loop.nodes[j]
                 w = loop.weights[j]
                 graph[sn].append((dn,w))
             result.append(self._plot(graph, f'{name_prefix}{i}', **plot_kwargs))
         return result
 
 
-    def plot_paths(self, from_node, to_node, name_prefix: str = 'SFG', find_kwargs: dict = {}, plot_kwargs: dict = {}) -> list[Digraph]:
+    def plot_paths(self, from_node, to_node, name_prefix: str = 'SFG', find_kwargs: dict = {}, plot_kwargs: dict = {}) -> "list[Digraph]":
         """
         Return a list graphviz.Digraph, one for each forward path between two specified nodes in the SFG.
         
@@ -129,7 +514,7 @@ class SFG:
             to_node:   node name where the path ends.
             name_prefix: name prefix for the graphviz Digraphs (suffix is just an int starting at 0);
                 only relevant if you want to export them later.
-            find_kwargs: keyword arguments for the find_loops() method.
+            find_kwargs: keyword arguments for the find_paths() method, e.g. to limit the number of paths.
             plot_kwargs: keyword arguments for the plot() method.
         
         Names can be provided the same way as for the `add()` method.
@@ -138,59 +523,60 @@ class SFG:
         result = []
         for i,path in enumerate(paths):
             graph = defaultdict(self._list_factory)
-            for i in range(len(path.nodes)-1):
-                sn, dn = path.nodes[i], path.nodes[i+1]
-                w = path.weights[i+1]
+            for k in range(len(path.nodes)-1):
+                sn, dn = path.nodes[k], path.nodes[k+1]
+                w = path.weights[k+1]
                 graph[sn].append((dn,w))
             result.append(self._plot(graph, f'{name_prefix}{i}', **plot_kwargs))
         return result
 
 
-    def find_loops(self, include_zero_gain: bool = False) -> list[Path]:
+    def find_loops(self, include_zero_gain: bool = False, workers: "int|None" = None, monitor: "AnalysisMonitor|None" = None) -> list[Path]:
         """
         Find all closed loops in the SFG.
 
         Args:
             include_zero_gain: if True, loops with zero gain are also included.
+            workers:           if given, the search is distributed to this number of worker processes.
+            monitor:           if given, the search is measured as phase 'loops', and can be cancelled; see `AnalysisMonitor`.
 
         Returns:
             A list of all closed loop paths.
         """
-        loops = []
-        def sort_loop(path, weights):
-            # two identical loops might appear different if they are shifted; this
-            #   method shifts the loop so that the lexically first node comes first
-            i_start = 0
-            for i,elem in enumerate(path):
-                if str(elem) < str(path[i_start]):
-                    i_start = i
-            for _ in range(i_start):
-                path = path[1:] + [path[0]]
-                weights = weights[1:] + [weights[0]]
-            return path, weights
-        def find_sub_loops(start):
-            def find_paths(origin, path, weights):
-                if origin not in self.graph:
-                    return # dead end
-                for (destination,weight) in self.graph[origin]:
-                    if destination in path:
-                        weights[0] = weight # there may be multiple paths leading here, make sure we use the correct weight
-                        loop = path[path.index(destination):]
-                        loop, weights = sort_loop(loop, weights)
-                        if loop not in [l.nodes for l in loops]:
-                            loops.append(SFG.Path(loop, weights))
-                        break
-                    else:
-                        if weight == 0 and not include_zero_gain:
-                            continue
-                        find_paths(destination, path+[destination], weights+[weight])
-            find_paths(start, [], [])
-        for start in self.graph.keys():
-            find_sub_loops(start)
-        return loops
+        if workers is None:
+            with measure(monitor, 'loops'):
+                return list(self.iter_loops(include_zero_gain, monitor))
+        from .parallel import WorkerPool
+
+        graph = self._compact_graph()
+        with measure(monitor, 'loops'), WorkerPool(graph, workers) as pool:
+            loops = pool.find_cycles(include_zero_gain)
+        if monitor is not None:
+            monitor.count('loops', len(loops))
+        return [SFG.Path([graph.nodes[i] for i in node_ids], [graph.weights[e] for e in edges]) for (node_ids,edges) in loops]
+
+
+    def iter_loops(self, include_zero_gain: bool = False, monitor: "AnalysisMonitor|None" = None) -> Iterator[Path]:
+        """
+        Iterate over all closed loops in the SFG, without holding all of them in memory.
+
+        Args:
+            include_zero_gain: if True, loops with zero gain are also included.
+            monitor:           if given, the loops and search steps are counted, and the search can be cancelled.
 
+        Returns:
+            A generator that yields each closed loop path exactly once. Parallel edges between the same
+                nodes are distinct edges, so they result in distinct loops.
+        """
+        graph = self._compact_graph()
+        for (node_ids,edges) in graph.iter_cycles(include_zero_gain, monitor=monitor):
+            if monitor is not None:
+                monitor.count('loops')
+            yield SFG.Path([graph.nodes[i] for i in node_ids], [graph.weights[e] for e in edges])
 
-    def find_paths(self, from_node, to_node, include_zero_gain: bool = False) -> list[Path]:
+
+    def find_paths(self, from_node, to_node, include_zero_gain: bool = False, max_paths: "int|None" = None,
+            max_length: "int|None" = None, timeout: "float|None" = None, monitor: "AnalysisMonitor|None" = None) -> list[Path]:
         """
         Find all paths between two specidied nodes in the SFG.
 
@@ -198,45 +584,91 @@ class SFG:
             from_node:         node name where the path starts.
             to_node:           node name where the path ends.
             include_zero_gain: if True, paths with zero gain are also included.
+            max_paths:         see `iter_paths()`.
+            max_length:        see `iter_paths()`.
+            timeout:           see `iter_paths()`.
+            monitor:           see `iter_paths()`; the search is measured as phase 'paths'.
 
         Names can be provided the same way as for the `add()` method.
 
         Returns:
             A list of all paths between the two nodes.
         """
+        with measure(monitor, 'paths'):
+            return list(self.iter_paths(from_node, to_node, include_zero_gain, max_paths, max_length, timeout, monitor))
+
+
+    def iter_paths(self, from_node, to_node, include_zero_gain: bool = False, max_paths: "int|None" = None,
+            max_length: "int|None" = None, timeout: "float|None" = None, monitor: "AnalysisMonitor|None" = None) -> Iterator[Path]:
+        """
+        Iterate over the paths between two specified nodes in the SFG, without holding all of them in memory.
+
+        The search never enters nodes from which the destination cannot be reached, so the paths are found
+            lazily, while the generator is consumed.
+
+        Args:
+            from_node:         node name where the path starts.
+            to_node:           node name where the path ends.
+            include_zero_gain: if True, paths with zero gain are also included.
+            max_paths:         if given, the iteration stops after this number of paths.
+            max_length:        if given, only paths with at most this number of edges are included.
+            timeout:           if given, a TimeoutError is raised when the iteration has not finished after this
+                number of seconds (including the time the caller spends between the paths).
+            monitor:           if given, the paths and search steps are counted, and the search can be cancelled.
+
+        Names can be provided the same way as for the `add()` method.
+
+        Returns:
+            A generator that yields each path exactly once. Parallel edges between the same nodes are distinct
+                edges, so they result in distinct paths.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
         from_node = self._split_name(from_node)
         to_node = self._split_name(to_node)
+        self._check_path_nodes(from_node, to_node)
+        if max_paths is not None and max_paths <= 0:
+            return
 
-        if from_node not in self.graph.keys():
-            raise ValueError(f'Node {from_node} does not exist as any source node')
-        if not any([to_node in node[0] for node in self.graph.values()]):
-            raise ValueError(f'Node {from_node} does not exist as any destination node')
-
-        paths = []
-        def find_paths(graph, origin, path, weights):
-            if origin == to_node:
-                paths.append(SFG.Path(path, weights))
+        graph = self._compact_graph()
+        paths = graph.iter_paths(graph.node_ids[from_node], graph.node_ids[to_node], include_zero_gain, max_length, deadline, monitor)
+        for count,(node_ids,edges) in enumerate(paths, 1):
+            if monitor is not None:
+                monitor.count('paths')
+            yield SFG.Path([graph.nodes[i] for i in node_ids], [1] + [graph.weights[e] for e in edges])
+            if count == max_paths:
                 return
-            elif origin not in self.graph:
-                return # dead end
-            for (destination,weight) in graph[origin]:
-                if destination in path:
-                    continue # loop
-                else:
-                    if weight == 0 and not include_zero_gain:
-                        continue
-                    find_paths(graph, destination, path+[destination], weights+[weight])
-        find_paths(self.graph, from_node, [from_node], [1])
-        return paths
 
 
-    def calculate_gain(self, from_node, to_node):
+    def calculate_gain(self, from_node, to_node, method: str = 'mason', workers: "int|None" = None,
+            monitor: "AnalysisMonitor|None" = None, reduction: bool = False):
         """
         Calculate the gain from one node to another node in the SFG.
 
         Args:
             from_node:         node name where the path starts.
             to_node:           node name where the path ends.
+            method:            'mason' to use Mason's gain formula, which works for any weight type.
+                'linear' to solve the linear equation system of the SFG instead, which requires all weights
+                to be numeric, but is much faster for large graphs (requires numpy and scipy).
+                'polynomial' to use Mason's gain formula with the weights converted to sparse polynomials in their
+                symbols, which returns a compact sympy rational function that needs no further simplification:
+                like terms are collected, and the determinant is factored into one polynomial per strongly
+                connected component (requires sympy; weights must be numbers or sympy expressions).
+                'numeric' to use Mason's gain formula with the loop and path gains as numpy arrays, so that the
+                non-touching loop sets are summed up in vectorized blocks (requires numpy; weights must be
+                numbers or numeric arrays, which are broadcast against each other, e.g. one value per frequency
+                point). It returns a numpy array with the broadcast shape, i.e. the gain over the whole sweep.
+            workers:           if given, the Mason methods distribute the analysis to this number of worker
+                processes. This only pays off for large graphs, because the graph must be sent to each worker.
+            monitor:           if given, collects statistics of the analysis, reports its progress, and allows to
+                cancel it; see `AnalysisMonitor`. Without workers, the Mason methods are measured in the
+                phases 'loops', 'paths', 'cofactors' and 'gains'.
+            reduction:         if True, the SFG is first reduced with the standard reduction rules: nodes that
+                are not on any path from the source to the sink are removed, parallel edges are summed up,
+                chains of nodes with one incoming and one outgoing edge are merged into one edge, and
+                self-loops are absorbed by dividing by (1 - L). The gain is the same, but the analysis of
+                the reduced SFG is faster; symbolic gains may come out in a different (equivalent) form.
+                The reduced SFG is kept until the next edit.
 
         Names can be provided the same way as for the `add()` method.
 
@@ -247,47 +679,358 @@ class SFG:
                 are sympy expressions, the return type is also a sympy expression.
         """
         
-        def product(factors):
-            Π = 1
-            for f in factors:
-                Π = Π * f
-            return Π
-
-        def get_cofactor(excluded_nodes=[]):
-            loops = self.find_loops(include_zero_gain=False)
-            loop_count = len(loops)
-            cofactor = 1
-            sign = -1
-            for order in range(1, loop_count+1):
-                # calculate all possible n-tuples
-                for loop_tuple_indices in itertools.combinations([i for i in range(loop_count)], order):
-                    include = True
-                    for li1 in range(len(loop_tuple_indices)):
-                        # check if we have to exclude this loop due to unwanted nodes
-                        for node in loops[loop_tuple_indices[li1]].nodes:
-                            if node in excluded_nodes:
-                                include = False
-                        # check if we have to exclude this due to touching loops
-                        for li2 in range(li1+1, len(loop_tuple_indices)):
-                            for node in loops[loop_tuple_indices[li1]].nodes:
-                                if node in loops[loop_tuple_indices[li2]].nodes:
-                                    include = False
-                    if include:
-                        # calculate product of all loops in the tuple
-                        Π = 1
-                        for li1 in range(len(loop_tuple_indices)):
-                            Π = Π * product(loops[loop_tuple_indices[li1]].weights)
-                        cofactor += sign * Π
-                sign = -sign
-            return cofactor
-        
-        paths = self.find_paths(from_node, to_node, include_zero_gain=False)
+        return self.calculate_gains([(from_node, to_node)], method, workers, monitor, reduction)[0]
+
+
+    def calculate_gains(self, pairs: "list[tuple]", method: str = 'mason', workers: "int|None" = None,
+            monitor: "AnalysisMonitor|None" = None, reduction: bool = False) -> list:
+        """
+        Calculate the gains between multiple pairs of nodes in the SFG.
+
+        The loops, the non-touching loop sets and the determinant are only calculated once, and shared
+            by all pairs, which is much faster than calling `calculate_gain()` for each pair. With the
+            'linear' method, the matrix is only factorized once.
+
+        Args:
+            pairs:     list of (from_node, to_node) tuples.
+            method:    see `calculate_gain()`.
+            workers:   see `calculate_gain()`; the pairs, the loop search, and the non-touching loop sets are
+                distributed to the workers, and the results are returned in the order of the pairs.
+            monitor:   see `calculate_gain()`.
+            reduction: see `calculate_gain()`; the SFG is reduced for all pairs together.
+
+        Names can be provided the same way as for the `add()` method.
+
+        Returns:
+            A list with the gain for each pair; see `calculate_gain()`.
+        """
+        if reduction:
+            return self._calculate_reduced_gains(pairs, method, workers, monitor)
+        graph = self._compact_graph()
+        if method in ('mason', 'polynomial', 'numeric'):
+            pair_ids = []
+            for (from_node,to_node) in pairs:
+                from_node, to_node = self._split_name(from_node), self._split_name(to_node)
+                self._check_path_nodes(from_node, to_node)
+                pair_ids.append((graph.node_ids[from_node], graph.node_ids[to_node]))
+            def analyze(pool: "WorkerPool|None" = None) -> tuple:
+                if method == 'polynomial':
+                    return self._analysis.polynomial_decomposition(pool, monitor)
+                if method == 'numeric':
+                    return self._analysis.numeric_decomposition(pool, monitor)
+                return self._analysis.decomposition(pool, monitor), None
+            def pair_paths(weights=None) -> list[list]:
+                return [self._analysis.paths(from_id, to_id, weights, monitor) for (from_id,to_id) in pair_ids]
+            def missing_cofactors() -> list[tuple[int,int]]:
+                return list(dict.fromkeys(key for paths in all_paths for key in decomposition.missing_cofactors(paths)))
+            if workers is None:
+                decomposition, weights = analyze()
+                all_paths = pair_paths(weights)
+                keys = missing_cofactors()
+                with measure(monitor, 'cofactors', len(keys)):
+                    decomposition.calculate_cofactors(keys, monitor)
+            else:
+                from .parallel import WorkerPool
+
+                with WorkerPool(graph, workers) as pool:
+                    decomposition, weights = analyze(pool)
+                    if weights is not None:
+                        all_paths = pair_paths(weights)
+                    else:
+                        with measure(monitor, 'paths'):
+                            all_paths = pool.find_paths(pair_ids)
+                    keys = missing_cofactors()
+                    with measure(monitor, 'cofactors', len(keys)):
+                        pool.calculate_cofactors(decomposition, keys)
+                if monitor is not None:
+                    monitor.count('cofactors', len(keys))
+            with measure(monitor, 'gains'):
+                if method == 'polynomial':
+                    return [weights.rational_function(decomposition, paths) for paths in all_paths]
+                if method == 'numeric':
+                    return [weights.result(decomposition.gain(paths, monitor)) for paths in all_paths]
+                return [decomposition.gain(paths, monitor) for paths in all_paths]
+        elif method == 'linear':
+            pairs = [(self._split_name(from_node), self._split_name(to_node)) for (from_node,to_node) in pairs]
+            for (from_node,to_node) in pairs:
+                self._check_path_nodes(from_node, to_node)
+            solver = LinearSolver(graph)
+            return solver.gains(pairs)
+        else:
+            raise ValueError(f'Unknown method "{method}"')
 
-        Σ = 0
-        for path in paths:
-            Σ += product(path.weights) * get_cofactor(path.nodes)
-        gain = Σ / get_cofactor()
-        return gain
+
+    def gain_matrix(self, sources: list, sinks: list, method: str = 'mason', workers: "int|None" = None,
+            monitor: "AnalysisMonitor|None" = None, reduction: bool = False) -> list[list]:
+        """
+        Calculate the gains from each of the source nodes to each of the sink nodes, e.g. to get all
+            S-parameters of a network.
+
+        Args:
+            sources:   list of node names where the paths start.
+            sinks:     list of node names where the paths end.
+            method:    see `calculate_gain()`.
+            workers:   see `calculate_gains()`.
+            monitor:   see `calculate_gain()`.
+            reduction: see `calculate_gains()`.
+
+        Names can be provided the same way as for the `add()` method.
+
+        Returns:
+            A nested list, where element [i][j] is the gain from sources[i] to sinks[j]; see `calculate_gain()`.
+        """
+        gains = self.calculate_gains([(source,sink) for source in sources for sink in sinks], method, workers, monitor, reduction)
+        return [gains[i*len(sinks):(i+1)*len(sinks)] for i in range(len(sources))]
+
+
+    async def calculate_gain_async(self, from_node, to_node, method: str = 'mason', workers: "int|None" = None,
+            service: "SFGService|None" = None):
+        """
+        Calculate the gain like `calculate_gain()`, but in a thread, so that the asyncio event loop is not blocked.
+            Concurrent identical requests are coalesced onto a single calculation.
+
+        Args:
+            from_node: node name where the path starts.
+            to_node:   node name where the path ends.
+            method:    see `calculate_gain()`.
+            workers:   see `calculate_gain()`.
+            service:   the service that runs the calculation; by default, a service with a thread pool that is
+                shared by all SFGs (`SFG.default_service()`).
+
+        Names can be provided the same way as for the `add()` method.
+        """
+        return await (service or SFG.default_service()).calculate_gain(self, from_node, to_node, method, workers)
+
+
+    async def calculate_gains_async(self, pairs: "list[tuple]", method: str = 'mason', workers: "int|None" = None,
+            service: "SFGService|None" = None) -> list:
+        """
+        Calculate the gains like `calculate_gains()`, without blocking the asyncio event loop; see `calculate_gain_async()`.
+
+        Args:
+            pairs:   list of (from_node, to_node) tuples.
+            method:  see `calculate_gain()`.
+            workers: see `calculate_gain()`.
+            service: see `calculate_gain_async()`.
+        """
+        return await (service or SFG.default_service()).calculate_gains(self, pairs, method, workers)
+
+
+    @classmethod
+    def default_service(cls) -> "SFGService":
+        """ Get the service that is shared by all SFGs for the asynchronous methods; it is created on first use. """
+        if cls._default_service is None:
+            from .service import SFGService
+            cls._default_service = SFGService()
+        return cls._default_service
+
+
+    def compile_gain(self, from_node, to_node, symbols: list) -> Callable:
+        """
+        Calculate the gain from one node to another node in the SFG as a sympy expression, and compile it
+            to a vectorized numpy function, e.g. to evaluate it over a frequency sweep (requires numpy and sympy).
+
+        Args:
+            from_node: node name where the path starts.
+            to_node:   node name where the path ends.
+            symbols:   the sympy symbols that become the arguments of the returned function, in this order.
+
+        Names can be provided the same way as for the `add()` method.
+
+        Returns:
+            A function that takes one value or numpy array per symbol, and returns the gain as a numpy
+                array with the broadcast shape of all arguments.
+        """
+        return compile_expression(self.calculate_gain(from_node, to_node), symbols)
+
+
+    def sweep(self, from_node, to_node, values: dict):
+        """
+        Calculate the gain from one node to another node in the SFG numerically, for many values of the weights
+            at once (requires numpy, and sympy for symbolic weights).
+
+        Unlike `compile_gain()`, this skips the symbolic analysis entirely, and instead solves the linear
+            equation system of the SFG for all sweep points in a batch.
+
+        Args:
+            from_node: node name where the path starts.
+            to_node:   node name where the path ends.
+            values:    dict of sympy symbol to a value or numpy array; all symbols in the weights must be included.
+                The arrays are broadcast against each other. Weights may also be numpy arrays themselves.
+
+        Names can be provided the same way as for the `add()` method.
+
+        Returns:
+            The gain as a numpy array with the broadcast shape of all values.
+        """
+        return self.sweep_gains([(from_node, to_node)], values)[0]
+
+
+    def sweep_gains(self, pairs: "list[tuple]", values: dict) -> list:
+        """
+        Calculate the gains between multiple pairs of nodes, like `sweep()`; the equation system is solved
+            only once for all pairs.
+
+        Args:
+            pairs:  list of (from_node, to_node) tuples.
+            values: see `sweep()`.
+
+        Returns:
+            A list with the gain for each pair; see `sweep()`.
+        """
+        pairs = [(self._split_name(from_node), self._split_name(to_node)) for (from_node,to_node) in pairs]
+        return sweep_gains(self._compact_graph(), pairs, values, weights=self._analysis.compiled_weights())
+
+
+    def sensitivity(self, from_node, to_node, values: dict, method: str = 'polynomial') -> tuple:
+        """
+        Calculate the gain from one node to another node in the SFG, and its partial derivatives with respect to
+            the symbols in the weights, for many values of the symbols at once (requires numpy and sympy).
+
+        The SFG is analyzed symbolically only once; the gain and all its derivatives are then compiled to one
+            vectorized function with common subexpressions, which is kept until the next edit of the SFG, so
+            further calls with other values only evaluate it.
+
+        Args:
+            from_node: node name where the path starts.
+            to_node:   node name where the path ends.
+            values:    dict of sympy symbol to a value or numpy array, e.g. one column of a table of parameter sets;
+                all symbols in the weights must be included. The arrays are broadcast against each other, and the
+                derivatives are calculated with respect to all these symbols.
+            method:    the method of the symbolic analysis; see `calculate_gain()`.
+
+        Names can be provided the same way as for the `add()` method.
+
+        Returns:
+            A tuple of the gain as a numpy array with the broadcast shape of all values, and a dict of each symbol
+                to the derivative of the gain with respect to it, with the same shape.
+        """
+        return self.sensitivities([(from_node, to_node)], values, method)[0]
+
+
+    def sensitivities(self, pairs: "list[tuple]", values: dict, method: str = 'polynomial') -> list[tuple]:
+        """
+        Calculate the gains between multiple pairs of nodes and their derivatives, like `sensitivity()`; the
+            SFG is analyzed only once for all pairs, and their evaluation shares the common subexpressions.
+
+        Args:
+            pairs:  list of (from_node, to_node) tuples.
+            values: see `sensitivity()`.
+            method: see `sensitivity()`.
+
+        Returns:
+            A list with the result for each pair; see `sensitivity()`.
+        """
+        symbols = list(values)
+        key = ('sensitivities', tuple((self._split_name(from_node), self._split_name(to_node)) for (from_node,to_node) in pairs), tuple(symbols), method)
+        evaluate = self._analysis.memoize(key, lambda: self.compile_sensitivities(pairs, symbols, method))
+        return [(gain, {symbol: gradient[..., i] for (i,symbol) in enumerate(symbols)}) for (gain,gradient) in evaluate(*values.values())]
+
+
+    def compile_sensitivities(self, pairs: "list[tuple]", symbols: list, method: str = 'polynomial') -> Callable:
+        """
+        Calculate the gains between multiple pairs of nodes as sympy expressions, and compile them together with
+            their partial derivatives to one vectorized numpy function (requires numpy and sympy).
+
+        Args:
+            pairs:   list of (from_node, to_node) tuples.
+            symbols: the sympy symbols that become the arguments of the returned function, in this order; the
+                derivatives are calculated with respect to them, and all symbols in the weights must be included.
+            method:  see `sensitivity()`.
+
+        Returns:
+            A function that takes one value or numpy array per symbol, e.g. one column of a table of parameter
+                sets, and returns a list with one (gain, jacobian) tuple per pair: the gain is a numpy array with
+                the broadcast shape of all arguments, and the jacobian has one more axis at the end, with the
+                derivative for each symbol.
+        """
+        return compile_gradients(self.calculate_gains(pairs, method), symbols)
+
+
+    def _compact_graph(self) -> CompactGraph:
+        """ Internal method to get the compact, integer-indexed representation of the graph. """
+        return self._analysis.compact()
+
+
+    def _check_path_nodes(self, from_node: tuple[str,str], to_node: tuple[str,str]):
+        """ Internal method to check that a path can exist between two (already split) node names. """
+        graph = self._compact_graph()
+        from_id = graph.node_ids.get(from_node)
+        if from_id is None or not graph.out_edges(from_id):
+            raise ValueError(f'Node {from_node} does not exist as any source node')
+        to_id = graph.node_ids.get(to_node)
+        if to_id is None or graph.in_degree[to_id] == 0:
+            raise ValueError(f'Node {to_node} does not exist as any destination node')
+
+
+    def _calculate_reduced_gains(self, pairs: "list[tuple]", method: str, workers: "int|None", monitor: "AnalysisMonitor|None") -> list:
+        """ Internal method to calculate gains on the SFG reduced for the pairs; see `calculate_gain()`. """
+        pairs = [(self._split_name(from_node), self._split_name(to_node)) for (from_node,to_node) in pairs]
+        for (from_node,to_node) in pairs:
+            self._check_path_nodes(from_node, to_node)
+        # the gain from a node to itself depends on all loops that do not touch it (Δₖ/Δ), which the reduction
+        # would remove, so these pairs are calculated on the SFG itself
+        diagonal = [(from_node,to_node) for (from_node,to_node) in pairs if from_node == to_node]
+        reduced_pairs = [(from_node,to_node) for (from_node,to_node) in pairs if from_node != to_node]
+        def create() -> SFG:
+            reduced = SFG(cache=self._analysis.cache)
+            reduced.graph.update(reduce_graph(self.graph, reduced_pairs))
+            reduced._analysis.structure_changed()
+            return reduced
+        reduced = self._analysis.memoize(('graph reduction', tuple(reduced_pairs)), create)
+        # the nodes of pairs without any path may have been removed, so their gain is zero
+        sinks = {destination for destinations in reduced.graph.values() for (destination,_) in destinations}
+        connected = [(from_node,to_node) for (from_node,to_node) in reduced_pairs if reduced.graph.get(from_node) and to_node in sinks]
+        gains = dict(zip(connected, reduced.calculate_gains(connected, method, workers, monitor) if connected else []))
+        if diagonal:
+            gains.update(zip(diagonal, self.calculate_gains(diagonal, method, workers, monitor)))
+        return [gains[pair] if pair in gains else self._zero_gain(method) for pair in pairs]
+
+
+    def _zero_gain(self, method: str):
+        """ Internal method to get the gain between two nodes without any path, of the type the method returns. """
+        if method == 'polynomial':
+            import sympy
+            return sympy.S.Zero
+        if method == 'numeric':
+            import numpy
+            weights = NumericWeights(self._compact_graph())
+            return weights.result(numpy.zeros(weights.edges.shape[1:], dtype=weights.edges.dtype))
+        return 0.0
+
+
+    def _block_edges(self, name: str) -> dict:
+        """ Internal method to get the current edges of a block, as dict of (input node, output node) to weight. """
+        block, inputs, outputs, _ = self._blocks[name]
+        sources = {(name, block._split_name(node)[1]) for node in inputs}
+        destinations = {(name, block._split_name(node)[1]) for node in outputs}
+        return {(source,destination): weight for source in sources for (destination,weight) in self.graph.get(source, []) if destination in destinations}
+
+
+    def _set_block_edges(self, name: str, current: dict):
+        """ Internal method to replace the current edges of a block with the gains of its reduction. """
+        block, inputs, outputs, method = self._blocks[name]
+        matrix = block.reduce(inputs, outputs, method)
+        edges = {}
+        for (i,source) in enumerate(inputs):
+            for (j,destination) in enumerate(outputs):
+                if not is_zero(matrix[i][j]):
+                    edges[((name, block._split_name(source)[1]), (name, block._split_name(destination)[1]))] = matrix[i][j]
+        if edges.keys() == current.keys():
+            # same structure, so the loops do not have to be searched again
+            for ((source,destination),weight) in edges.items():
+                if weight is not current[(source,destination)]:
+                    self.set_weight(source, destination, weight)
+            return
+        for (source,destination) in current:
+            remaining = [(d,w) for (d,w) in self.graph[source] if d != destination]
+            if remaining:
+                self.graph[source] = remaining
+            else:
+                del self.graph[source]
+        for ((source,destination),weight) in edges.items():
+            self.graph[source].append((destination,weight))
+        self._analysis.structure_changed()
 
 
     def _split_name(self, name: "tuple[str,str]|str"):
@@ -301,46 +1044,10 @@ class SFG:
         return (None, name)
 
     
-    def _plot(self, graph: dict[tuple[str,str],list], name: str, show_unity_weights: bool = True) -> Digraph:
+    def _plot(self, graph: dict[tuple[str,str],list], name: str, show_unity_weights: bool = True, aggregate_edges: bool = False,
+            collapse_groups: "Iterable[str]|bool|None" = None) -> "Digraph":
         """ Internal method to create a graphviz Digraph. """
-        g = Digraph('G', filename=name)
-        g.attr(**self.graph_attrs.graph)
-
-        all_nodes = []
-        all_groups = []
-        for (src_group,src_name),dw in graph.items():
-            all_nodes.append((src_group,src_name))
-            all_groups.append(src_group)
-            for ((dest_group,dest_name),_) in dw:
-                all_nodes.append((dest_group,dest_name))
-                all_groups.append(dest_group)
-        
-        for i,graphed_group in enumerate(set(all_groups)):
-            if graphed_group is None:
-                continue
-            with g.subgraph(name=f'cluster_{i}') as gsub:
-                gsub.attr(label=str(graphed_group), **self.graph_attrs.group)
-                for (group,name) in all_nodes:
-                    if group!=graphed_group:
-                        continue
-                    gsub.attr('node', **self.graph_attrs.node)
-                    gsub.node(str((group,name)), label=name)
-        
-        for (group,name) in all_nodes:
-            if group is not None:
-                continue
-            g.attr('node', **self.graph_attrs.node)
-            g.node(str((group,name)), label=name)
+        from graphviz import Digraph
 
-        
-        for source,destinations in graph.items():
-            for (dest,weight) in destinations:
-                g.attr('edge', **self.graph_attrs.edge)
-                
-                if (not show_unity_weights) and (weight == 1):
-                    label = None
-                else:
-                    label = str(weight)
-                g.edge(str(source), str(dest), label=label)
-        
-        return g
+        return Digraph('G', filename=name, graph_attr=self.graph_attrs.graph, node_attr=self.graph_attrs.node, edge_attr=self.graph_attrs.edge,
+            body=list(body_lines(graph, self.graph_attrs.group, show_unity_weights, aggregate_edges, collapse_groups)))
@@ -0,0 +1,173 @@
+""" Binary storage of a SFG, optionally together with its analysis results.
+
+File layout: an 8-byte magic, the length of the header as 8-byte integer, the header (a pickled dict), and
+    then the arrays, each aligned to 8 bytes. The arrays hold the CSR layout of the graph (see CompactGraph),
+    numeric weights, and the loops; when loading, they are memory-mapped instead of read, so processes that
+    load the same file share the memory, and loading takes almost no time. Everything that is not an array
+    (node names, symbolic weights, the Mason decomposition with its non-touching loop sets and cofactors) is
+    in the header.
+
+Since the header is pickled, only load files from trusted sources.
+"""
+
+from array import array
+import mmap
+import os
+import pickle
+import stat
+import struct
+import sys
+import tempfile
+from .compact import CompactGraph
+
+
+MAGIC = b'SFGDATA1'
+
+# the umask can only be read by setting it, which is not thread-safe, so it is read once while importing
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _aligned(size: int) -> int:
+    """ Internal function to round a size up to a multiple of 8 bytes. """
+    return (size + 7) & ~7
+
+
+def write(path, header: dict, arrays: dict[str,array]):
+    """
+    Write a header and arrays to a file.
+
+    Args:
+        path:   path of the file.
+        header: picklable dict.
+        arrays: dict of name to array.array.
+    """
+    sections = {}
+    position = 0
+    for name,values in arrays.items():
+        sections[name] = (position, values.typecode, len(values))
+        position += _aligned(len(values) * values.itemsize)
+    data = pickle.dumps(dict(header, byteorder=sys.byteorder, sections=sections), protocol=pickle.HIGHEST_PROTOCOL)
+    # processes that loaded the file keep it memory-mapped, so it is replaced by a new file instead of overwritten
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile(dir=directory, prefix='.' + os.path.basename(path) + '.', delete=False) as fp:
+        try:
+            fp.write(MAGIC)
+            fp.write(struct.pack('<Q', len(data)))
+            fp.write(data)
+            fp.write(bytes(_aligned(16 + len(data)) - 16 - len(data)))
+            for values in arrays.values():
+                raw = values.tobytes()
+                fp.write(raw)
+                fp.write(bytes(_aligned(len(raw)) - len(raw)))
+            fp.flush()
+            os.fsync(fp.fileno())
+            # temporary files are only readable by their owner; keep the permissions of the file that is replaced,
+            # or else give it those of a normally created file
+            try:
+                mode = stat.S_IMODE(os.stat(path).st_mode)
+            except FileNotFoundError:
+                mode = 0o666 & ~_UMASK
+            os.chmod(fp.name, mode)
+        except BaseException:
+            fp.close()
+            os.remove(fp.name)
+            raise
+    os.replace(fp.name, path)
+
+
+def read(path) -> tuple[dict,dict[str,memoryview]]:
+    """
+    Read a file that was written by write().
+
+    Returns:
+        A tuple (header, arrays), where the arrays are read-only memoryviews into the memory-mapped file.
+    """
+    with open(path, 'rb') as fp:
+        mapped = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+    if view[:len(MAGIC)] != MAGIC:
+        raise ValueError(f'{path} is not a SFG file')
+    (length,) = struct.unpack_from('<Q', view, len(MAGIC))
+    header = pickle.loads(view[16:16+length])
+    if header['byteorder'] != sys.byteorder:
+        raise ValueError(f'{path} was written on a machine with a different byte order')
+    base = _aligned(16 + length)
+    arrays = {}
+    for name,(position,typecode,count) in header['sections'].items():
+        start = base + position
+        arrays[name] = view[start:start + count*array(typecode).itemsize].cast(typecode)
+    return header, arrays
+
+
+def _weight_arrays(weights: list) -> tuple[str,dict[str,array],"list|None"]:
+    """ Internal function to store the weights as an array if they are all of the same numeric type, else as objects. """
+    for (kind,typecode) in [(int, 'q'), (float, 'd')]:
+        if all(type(w) is kind for w in weights):
+            try:
+                return kind.__name__, dict(weights=array(typecode, weights)), None
+            except OverflowError:
+                break
+    if weights and all(type(w) is complex for w in weights):
+        return 'complex', dict(weights=array('d', [part for w in weights for part in (w.real, w.imag)])), None
+    return 'object', {}, weights
+
+
+def save_graph(path, graph: CompactGraph, sources: list[int], header: dict, loops: "list|None" = None,
+        loop_components: "list[int]|None" = None, decomposition = None):
+    """
+    Save a compact graph, and optionally its analysis results.
+
+    Args:
+        path:            path of the file.
+        graph:           the graph.
+        sources:         the node IDs of the keys of SFG.graph, in their order, so that it can be re-created exactly.
+        header:          further picklable data to store, e.g. settings of the SFG.
+        loops:           if given, the loops; see IncrementalAnalysis.loops().
+        loop_components: if loops are given, the component index of each loop.
+        decomposition:   if given, the Mason decomposition.
+    """
+    kind, arrays, objects = _weight_arrays(graph.weights)
+    arrays = dict(
+        offsets=array('q', graph.offsets),
+        targets=array('q', graph.targets),
+        sources=array('q', sources),
+        **arrays,
+    )
+    if loops is not None:
+        loop_offsets = array('q', [0])
+        loop_edges = array('q')
+        for (_,edges) in loops:
+            loop_edges.extend(edges)
+            loop_offsets.append(len(loop_edges))
+        arrays.update(loop_offsets=loop_offsets, loop_edges=loop_edges, loop_components=array('q', loop_components))
+    write(path, dict(header, nodes=graph.nodes, weight_kind=kind, weights=objects, decomposition=decomposition), arrays)
+
+
+def load_graph(path) -> tuple[dict,CompactGraph,list[int],"list|None","list[int]|None"]:
+    """
+    Load a file that was written by save_graph().
+
+    Returns:
+        A tuple (header, graph, sources, loops, loop_components); the Mason decomposition (or None) is
+            header['decomposition'].
+    """
+    header, arrays = read(path)
+    kind = header['weight_kind']
+    if kind == 'object':
+        weights = header['weights']
+    elif kind == 'complex':
+        parts = arrays['weights']
+        weights = [complex(parts[i], parts[i+1]) for i in range(0, len(parts), 2)]
+    else:
+        weights = arrays['weights'].tolist()
+    graph = CompactGraph.from_csr(header['nodes'], arrays['offsets'], arrays['targets'], weights)
+    loops, loop_components = None, None
+    if 'loop_offsets' in arrays:
+        offsets, edges, targets = arrays['loop_offsets'], arrays['loop_edges'], graph.targets
+        loops = []
+        for i in range(len(offsets) - 1):
+            loop_edges = tuple(edges[offsets[i]:offsets[i+1]])
+            loops.append(([targets[e] for e in loop_edges], loop_edges))
+        loop_components = arrays['loop_components'].tolist()
+    return header, graph, arrays['sources'].tolist(), loops, loop_components
@@ -0,0 +1,187 @@
+""" Vectorized evaluation of SFG gains over many parameter values, e.g. over a frequency sweep.
+
+Requires the numpy package, and the sympy package for symbolic weights.
+"""
+
+from typing import Callable
+from .compact import CompactGraph
+
+
+def compile_expression(expression, symbols: list) -> Callable:
+    """
+    Compile an expression to a vectorized numpy function.
+
+    Args:
+        expression: the expression to compile; a sympy expression, or just a number.
+        symbols:    the sympy symbols that become the arguments of the returned function, in this order.
+
+    Returns:
+        A function that takes one value or numpy array per symbol, and returns a numpy array with the
+            broadcast shape of all arguments. Common subexpressions are only evaluated once.
+    """
+    import numpy
+    import sympy
+
+    function = sympy.lambdify(symbols, expression, modules='numpy', cse=True)
+    def evaluate(*values):
+        assert len(values) == len(symbols), f'Expecting {len(symbols)} arguments'
+        result = numpy.asarray(function(*values))
+        shape = numpy.broadcast_shapes(*[numpy.shape(v) for v in values])
+        if result.shape != shape:
+            result = numpy.broadcast_to(result, shape).copy()
+        return result
+    return evaluate
+
+
+def compile_gradients(expressions: list, symbols: list) -> Callable:
+    """
+    Compile expressions and their partial derivatives with respect to the symbols to one vectorized numpy
+        function, e.g. the gains of a SFG and their sensitivities to its parameters.
+
+    All expressions and derivatives are compiled together, so subexpressions that they share (e.g. the
+        determinant of the SFG, which is in every gain and every derivative) are only evaluated once.
+
+    Args:
+        expressions: the expressions to differentiate; sympy expressions, or just numbers.
+        symbols:     the sympy symbols that become the arguments of the returned function, in this order; all
+            free symbols of the expressions must be included.
+
+    Returns:
+        A function that takes one value or numpy array per symbol, and returns a list with one (value, gradient)
+            tuple per expression. The value is a numpy array with the broadcast shape of all arguments, and the
+            gradient has one more axis at the end, with the derivative for each symbol.
+    """
+    import numpy
+    import sympy
+
+    expressions = [sympy.sympify(expression) for expression in expressions]
+    missing = {s for expression in expressions for s in expression.free_symbols} - set(symbols)
+    if missing:
+        raise ValueError(f'No values provided for {", ".join(sorted(str(s) for s in missing))}')
+    flat = []
+    for expression in expressions:
+        flat += [expression] + [sympy.diff(expression, symbol) for symbol in symbols]
+    function = sympy.lambdify(symbols, flat, modules='numpy', cse=True)
+    n = len(symbols) + 1
+    def evaluate(*values):
+        assert len(values) == len(symbols), f'Expecting {len(symbols)} arguments'
+        shape = numpy.broadcast_shapes(*[numpy.shape(v) for v in values])
+        results = [numpy.broadcast_to(result, shape) for result in function(*values)]
+        gradients = []
+        for i in range(len(expressions)):
+            (value, *derivatives) = results[i*n:(i+1)*n]
+            gradient = numpy.stack(derivatives, axis=-1) if derivatives else numpy.zeros(shape + (0,), dtype=value.dtype)
+            gradients.append((value.copy(), gradient))
+        return gradients
+    return evaluate
+
+
+def compile_weight(weight) -> Callable:
+    """
+    Compile an edge weight to a function that evaluates it numerically.
+
+    Args:
+        weight: a number, a numpy array, or a sympy expression.
+
+    Returns:
+        A function that takes a dict of sympy symbol to value or numpy array, which must include all free
+            symbols of the weight, and returns the weight as a numpy value or array.
+    """
+    import numpy
+
+    free_symbols = getattr(weight, 'free_symbols', None)
+    if free_symbols is None:
+        value = numpy.asarray(weight)
+        return lambda values: value
+    symbols = sorted(free_symbols, key=str)
+    function = compile_expression(weight, symbols)
+    def evaluate(values: dict):
+        missing = [s for s in symbols if s not in values]
+        if missing:
+            raise ValueError(f'No values provided for {", ".join(str(s) for s in missing)}')
+        return function(*[values[s] for s in symbols])
+    return evaluate
+
+
+def compile_weights(graph: CompactGraph) -> list:
+    """
+    Compile the weights of a graph with compile_weight(), so that sweeps only have to evaluate them.
+
+    Returns:
+        A list with the compiled function of each edge ID, or None for edges with zero weight. Equal weights
+            share one function.
+    """
+    compiled = {}
+    result = []
+    for (weight,zero) in zip(graph.weights, graph.zero):
+        if zero:
+            result.append(None)
+            continue
+        try:
+            function = compiled.get(weight)
+            if function is None:
+                function = compiled[weight] = compile_weight(weight)
+        except TypeError:
+            # not hashable, e.g. a numpy array
+            function = compile_weight(weight)
+        result.append(function)
+    return result
+
+
+def sweep_gains(graph: CompactGraph, pairs: "list[tuple]", values: dict, max_chunk_elements: int = 1<<22,
+        weights: "list|None" = None) -> list:
+    """
+    Calculate gains by solving the linear equation system of the SFG numerically for each sweep point.
+
+    The matrices (I - A) of all sweep points are stacked and solved in a single call of numpy.linalg.solve(),
+        in chunks so that the memory stays bounded.
+
+    Args:
+        graph:              the SFG to solve.
+        pairs:              list of (from_node, to_node) tuples, with names as (group,name) tuples.
+        values:             dict of sympy symbol to value or numpy array; the arrays are broadcast against each other.
+        max_chunk_elements: maximum number of matrix elements that are solved in one call.
+        weights:            the compiled weights of the graph (see compile_weights()); if None, they are compiled.
+
+    Returns:
+        A list with one numpy array per pair, with the broadcast shape of all values.
+    """
+    import numpy
+
+    node_ids = graph.node_ids
+    for pair in pairs:
+        for node in pair:
+            if node not in node_ids:
+                raise ValueError(f'Node {node} does not exist')
+
+    if weights is None:
+        weights = compile_weights(graph)
+    evaluated = []
+    for source_id in range(len(graph.nodes)):
+        for e in graph.out_edges(source_id):
+            if not graph.zero[e]:
+                evaluated.append((source_id, graph.targets[e], weights[e](values)))
+    shape = numpy.broadcast_shapes(*[numpy.shape(v) for v in values.values()], *[w.shape for (_,_,w) in evaluated])
+    dtype = numpy.result_type(float, *[w.dtype for (_,_,w) in evaluated])
+    points = int(numpy.prod(shape))
+    edges = [(i, j, numpy.broadcast_to(w, shape).reshape(points)) for (i,j,w) in evaluated]
+
+    source_columns = {}
+    for (from_node,_) in pairs:
+        source_columns.setdefault(node_ids[from_node], len(source_columns))
+
+    n = len(graph.nodes)
+    x = numpy.empty((points, n, len(source_columns)), dtype=dtype)
+    chunk = max(1, max_chunk_elements // max(1, n*n))
+    for start in range(0, points, chunk):
+        stop = min(points, start+chunk)
+        m = numpy.zeros((stop-start, n, n), dtype=dtype)
+        m[:, range(n), range(n)] = 1
+        for (source_id,destination_id,w) in edges:
+            m[:, destination_id, source_id] -= w[start:stop]
+        rhs = numpy.zeros((stop-start, n, len(source_columns)), dtype=dtype)
+        for source_id,column in source_columns.items():
+            rhs[:, source_id, column] = 1
+        x[start:stop] = numpy.linalg.solve(m, rhs)
+
+    return [x[:, node_ids[to_node], source_columns[node_ids[from_node]]].reshape(shape) for (from_node,to_node) in pairs]
@@ -31,12 +31,8 @@ network.add('B.2b', '2b')
 g = network.plot(show_unity_weights=False)
 g.render(outfile='output/05_sparam_matrix.pdf', view=True, cleanup=True)
 
-# calculate the four S-parameters of the cascade network
-s11 = network.calculate_gain('1a', '1b')
-s21 = network.calculate_gain('1a', '2b')
-s12 = network.calculate_gain('2a', '1b')
-s22 = network.calculate_gain('2a', '2b')
-s = sympy.Matrix([[s11,s21],[s12,s22]])
+# calculate the four S-parameters of the cascade network; the loops are only analyzed once for all of them
+s = sympy.Matrix(network.gain_matrix(['1a', '2a'], ['1b', '2b']))
 sympy.init_printing() 
 sympy.pprint(s)
 
@@ -0,0 +1,28 @@
+import _env
+from lib import SFG
+import sympy
+import numpy
+
+
+# a control loop with a PI controller and a first-order system, in the Laplace domain
+s, kp, ki, τ = sympy.symbols('s, K_p, K_i, τ')
+control_loop = SFG(group_name_sep='.')
+control_loop.add('Ref', 'Loop.Σ')
+control_loop.add('Loop.Σ', 'Loop.Ctrl')
+control_loop.add('Loop.Ctrl', 'Loop.Sys', kp + ki/s)
+control_loop.add('Loop.Sys', 'Out', 1/(1+s*τ))
+control_loop.add('Out', 'Loop.Σ', -1)
+
+frequencies = numpy.logspace(-2, 3, 100_001)
+values = {s: 2j*numpy.pi*frequencies, kp: 2.0, ki: 10.0, τ: 0.1}
+
+# option 1: calculate the gain symbolically, and compile it into a vectorized function
+closed_loop = control_loop.compile_gain('Ref', 'Out', [s, kp, ki, τ])
+response_compiled = closed_loop(*values.values())
+
+# option 2: skip the symbolic calculation, and solve the SFG numerically for all frequencies
+response_solved = control_loop.sweep('Ref', 'Out', values)
+
+print(f'Max. deviation between compiled and solved response: {numpy.max(numpy.abs(response_compiled-response_solved)):.3g}')
+print(f'Gain at {frequencies[0]:.3g} Hz: {20*numpy.log10(numpy.abs(response_compiled[0])):.3g} dB')
+print(f'Gain at {frequencies[-1]:.3g} Hz: {20*numpy.log10(numpy.abs(response_compiled[-1])):.3g} dB')
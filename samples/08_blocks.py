@@ -0,0 +1,46 @@
+import _env
+from lib import SFG
+import sympy
+
+
+# a two-port with internal feedback, e.g. an amplifier; port k has the incident wave ka and the reflected wave kb
+g, h, r1, r2 = sympy.symbols('g, h, r_1, r_2')
+amplifier = SFG(group_name_sep='.')
+amplifier.add('1a', 'Core.in')
+amplifier.add('Core.in', 'Core.out', g)
+amplifier.add('Core.out', 'Core.in', h)
+amplifier.add('Core.in', '1b', r1)
+amplifier.add('Core.out', '2b')
+amplifier.add('2a', 'Core.out', r2)
+
+# its S-parameter matrix; element [i][j] is the gain from input i to output j
+sympy.pprint(sympy.Matrix(amplifier.reduce(['1a', '2a'], ['1b', '2b'])))
+
+# a matched attenuator, given by its S-parameters; its reflections S11 and S22 are zero, so they are no edges
+attenuator = SFG.from_sparam_blocks({'Pad': [[0, 0.5], [0.5, 0]]})
+sympy.pprint(sympy.Matrix(attenuator.reduce(['Pad.1a', 'Pad.2a'], ['Pad.1b', 'Pad.2b'])))
+
+# cascade the attenuator and three amplifiers; each block is only reduced once, and the cascade is analyzed on
+# the reduced blocks
+cascade = SFG(group_name_sep='.')
+cascade.add_block('Pad', attenuator, ['Pad.1a', 'Pad.2a'], ['Pad.1b', 'Pad.2b'])
+for name in ['A1', 'A2', 'A3']:
+    cascade.add_block(name, amplifier, ['1a', '2a'], ['1b', '2b'])
+cascade.add('In', 'Pad.1a')
+cascade.add('Pad.2b', 'A1.1a')
+cascade.add('A1.1b', 'Pad.2a')
+cascade.add('A1.2b', 'A2.1a')
+cascade.add('A2.1b', 'A1.2a')
+cascade.add('A2.2b', 'A3.1a')
+cascade.add('A3.1b', 'A2.2a')
+cascade.add('A3.2b', 'Out')
+
+dot = cascade.plot(show_unity_weights=False)
+dot.render(outfile='output/08_blocks.pdf', view=True, cleanup=True)
+
+sympy.pprint(sympy.simplify(cascade.calculate_gain('In', 'Out')))
+
+# after editing the amplifier, update the cascade; the amplifier is reduced again once, for all instances
+amplifier.set_weight('Core.out', 'Core.in', 0)
+cascade.update_blocks()
+sympy.pprint(sympy.simplify(cascade.calculate_gain('In', 'Out')))